@@ -7,18 +7,29 @@ from routes.posts import posts_bp
 from routes.auth import auth_bp
 from routes.categories import categories_bp
 from routes.comments import comments_bp
+from routes.admin import admin_bp
+from routes.stats import stats_bp
 from flask_cors import CORS
+from utils.trending import trending
+from utils.pubsub import event_hub
+from utils.blocklist import blocklist
+from utils.views import view_counter
+from utils.cache import cache
+from utils.schema import upgrade_schema, schema_is_outdated
 
 
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
-    CORS(app, resources={r"/api/*": {"origins": ["http://localhost:5173", "http://localhost:5000"]}}, supports_credentials=True)
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
+    CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}}, supports_credentials=True)
     app.url_map.strict_slashes = False
 
     # Инициализация JWT
     jwt = JWTManager(app)
+    blocklist.init_app(app)
 
     # Инициализация базы данных
     db.init_app(app)
@@ -26,11 +37,25 @@ def create_app():
     # Инициализация миграций
     migrate = Migrate(app, db)
 
+    # Рейтинг трендовых постов
+    trending.init_app(app)
+
+    # Шина событий для SSE-потоков
+    event_hub.init_app(app)
+
+    # Счётчики просмотров постов
+    view_counter.init_app(app)
+
+    # Кэш (общий для воркеров при CACHE_BACKEND = 'sqlite')
+    cache.init_app(app)
+
     # Регистрация blueprintов
     app.register_blueprint(posts_bp, url_prefix='/api')
     app.register_blueprint(comments_bp, url_prefix='/api')
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(categories_bp, url_prefix='/api/categories')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(stats_bp, url_prefix='/api/stats')
 
     # CLI команды для миграций
     @app.cli.command('db-init')
@@ -41,6 +66,42 @@ def create_app():
             os.system('flask db init')
             print("Миграции инициализированы")
 
+    @app.cli.command('upgrade-schema')
+    def upgrade_schema_command():
+        """Обновление схемы существующей БД до текущих моделей (см. utils/schema.py)"""
+        added = upgrade_schema()
+        if added:
+            print("Схема обновлена, добавлены колонки: " + ", ".join(sorted(added)))
+        else:
+            print("Схема БД актуальна")
+
+    @app.cli.command('recount-comments')
+    def recount_comments():
+        """Пересчёт денормализованного счётчика комментариев у постов"""
+        from models import Post
+        Post.recount_comments()
+        print("Счётчики комментариев пересчитаны")
+
+    @app.cli.command('backfill-comment-paths')
+    def backfill_comment_paths():
+        """Заполнение материализованных путей у старых комментариев"""
+        from models import Comment
+        Comment.backfill_paths()
+        print("Пути комментариев заполнены")
+
+    @app.cli.command('reindex-users')
+    def reindex_users():
+        """Перестроение поискового индекса пользователей"""
+        from models import User
+        User.rebuild_search_index()
+        print("Поисковый индекс пользователей перестроен")
+
+    @app.cli.command('stats-catch-up')
+    def stats_catch_up():
+        """Догнать дневные агрегаты статистики (можно запускать по cron)"""
+        from utils.stats import catch_up
+        print(catch_up())
+
     # JWT колбэки
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -54,6 +115,14 @@ def create_app():
     def missing_token_callback(error):
         return jsonify({'error': 'Missing authorization token'}), 401
 
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return blocklist.is_revoked(jwt_payload)
+
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has been revoked'}), 401
+
     # Обработчики ошибок
     @app.errorhandler(404)
     def not_found(error):
@@ -64,9 +133,13 @@ def create_app():
         db.session.rollback()
         return jsonify({'error': 'Internal server error'}), 500
 
-    # Создание таблиц при первом запуске
+    # Создание таблиц при первом запуске; схему старой БД меняет только flask upgrade-schema
     with app.app_context():
         db.create_all()
+        if schema_is_outdated():
+            app.logger.warning('Database schema is outdated, run "flask upgrade-schema"')
+        else:
+            blocklist.load()
 
     return app
 
@@ -0,0 +1,295 @@
+"""
+ASGI-точка входа.
+
+Читающие эндпоинты (GET /api/posts, /api/posts/<id>, /api/categories,
+/api/posts/<id>/comments и SSE-поток комментариев) обслуживаются асинхронными
+обработчиками поверх async-движка SQLAlchemy (aiosqlite) с теми же моделями
+и тем же JSON, что и blueprints. Всё остальное проксируется во Flask-приложение
+через WsgiToAsgi.
+
+Запуск: uvicorn asgi:app --port 5000
+"""
+import asyncio
+import math
+import re
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import create_app
+from models import db, Post, Category, Comment, PostContent
+from routes.comments import comments_channel, sse_message
+from routes.posts import posts_select, post_load_options, parse_ids
+from utils.pubsub import event_hub
+from utils.views import view_counter
+from utils.cache import cache
+
+
+class QueryArgs(dict):
+    """Минимальный аналог request.args: get() с приведением типа и значением по умолчанию"""
+
+    def get(self, key, default=None, type=None):
+        if key not in self:
+            return default
+        value = self[key]
+        if type is None:
+            return value
+        try:
+            return type(value)
+        except (TypeError, ValueError):
+            return default
+
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.config = flask_app.config
+
+        url = self.config.get('ASYNC_SQLALCHEMY_DATABASE_URI')
+        if not url:
+            # Flask-SQLAlchemy разрешает относительный путь sqlite относительно instance/
+            with flask_app.app_context():
+                url = db.engine.url
+            if url.get_backend_name() != 'sqlite':
+                raise RuntimeError(
+                    f'ASYNC_SQLALCHEMY_DATABASE_URI must be set for "{url.get_backend_name()}" databases')
+            url = url.set(drivername='sqlite+aiosqlite')
+        self.engine = create_async_engine(url)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+
+        if self.engine.dialect.name == 'sqlite':
+            @event.listens_for(self.engine.sync_engine, 'connect')
+            def register_sqlite_functions(dbapi_connection, connection_record):
+                dbapi_connection.run_async(lambda conn: conn.create_function(
+                    'post_content_text', 2, PostContent.decode, deterministic=True))
+
+        self.routes = [
+            (re.compile(r'^/api/posts/?$'), self.get_posts),
+            (re.compile(r'^/api/posts/(?P<post_id>\d+)/?$'), self.get_post),
+            (re.compile(r'^/api/posts/(?P<post_id>\d+)/comments/?$'), self.get_post_comments),
+            (re.compile(r'^/api/posts/(?P<post_id>\d+)/comments/stream/?$'), self.stream_post_comments),
+            (re.compile(r'^/api/categories/?$'), self.get_categories),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            for pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match:
+                    kwargs = {k: int(v) for k, v in match.groupdict().items()}
+                    return await handler(scope, receive, send, **kwargs)
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                view_counter.flush()
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ---------- HTTP helpers ----------
+
+    def response_headers(self, scope, content_type):
+        headers = [(b'content-type', content_type)]
+        # Те же CORS-заголовки, что выставляет Flask-CORS для /api/*
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        if origin in self.config['CORS_ORIGINS']:
+            headers += [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+        return headers
+
+    async def send_json(self, scope, send, payload, status=200):
+        body = (self.flask_app.json.dumps(payload) + '\n').encode('utf-8')
+        headers = self.response_headers(scope, b'application/json')
+        headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def not_found(self, scope, send):
+        await self.send_json(scope, send, {'error': 'Resource not found'}, 404)
+
+    @staticmethod
+    def query_args(scope):
+        args = QueryArgs()
+        for key, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            args.setdefault(key, value)
+        return args
+
+    # ---------- Обработчики ----------
+
+    async def get_posts(self, scope, receive, send):
+        args = self.query_args(scope)
+
+        async with self.session() as session:
+            # Пакетная выборка: /api/posts?ids=1,2,3
+            if 'ids' in args:
+                ids, error = parse_ids(args.get('ids'), self.config['POSTS_BATCH_MAX_SIZE'])
+                if error:
+                    return await self.send_json(scope, send, {'error': error}, 400)
+                result = await session.scalars(
+                    db.select(Post).options(*post_load_options()).filter(Post.id.in_(ids)))
+                found = {post.id: post.to_dict() for post in result.unique()}
+                return await self.send_json(scope, send, {
+                    'posts': [found[post_id] for post_id in ids if post_id in found],
+                    'missing': [post_id for post_id in ids if post_id not in found]
+                })
+
+            # Параметры пагинации – как у Flask-SQLAlchemy paginate(error_out=False)
+            page = args.get('page', 1, type=int)
+            per_page = args.get('per_page', 10, type=int)
+            page_number = page if page >= 1 else 1
+            per_page = per_page if per_page >= 1 else 20
+
+            query, error = posts_select(args)
+            if error:
+                return await self.send_json(scope, send, {'error': error}, 400)
+
+            total = await session.scalar(
+                db.select(db.func.count()).select_from(query.order_by(None).subquery()))
+            result = await session.scalars(query.limit(per_page).offset((page_number - 1) * per_page))
+            posts = [post.to_dict() for post in result.unique()]
+
+        await self.send_json(scope, send, {
+            'posts': posts,
+            'total': total,
+            'pages': math.ceil(total / per_page) if total else 0,
+            'current_page': page
+        })
+
+    async def get_post(self, scope, receive, send, post_id):
+        async with self.session() as session:
+            result = await session.scalars(
+                db.select(Post).options(*post_load_options()).filter(Post.id == post_id))
+            post = result.unique().first()
+            if post is None:
+                return await self.not_found(scope, send)
+            view_counter.hit(post_id)
+            payload = post.to_dict()
+        await self.send_json(scope, send, payload)
+
+    async def get_post_comments(self, scope, receive, send, post_id):
+        args = self.query_args(scope)
+        # Постраничный вывод веток – во Flask-маршруте
+        if 'page' in args:
+            return await self.wsgi(scope, receive, send)
+
+        async with self.session() as session:
+            if await session.get(Post, post_id) is None:
+                return await self.not_found(scope, send)
+
+            query = db.select(Comment).filter_by(post_id=post_id)
+            base_depth = 0
+            root_id = args.get('root_id', type=int)
+            if root_id is not None:
+                root = (await session.scalars(db.select(Comment).filter_by(id=root_id, post_id=post_id))).first()
+                if root is None:
+                    return await self.not_found(scope, send)
+                query = db.select(Comment).filter(root.subtree_filter())
+                base_depth = root.depth
+
+            max_depth = args.get('max_depth', type=int)
+            if max_depth is not None and max_depth >= 0:
+                query = query.filter(Comment.depth <= base_depth + max_depth)
+
+            comments = await session.scalars(query.order_by(Comment.path))
+            payload = [c.to_dict() for c in comments]
+        await self.send_json(scope, send, payload)
+
+    async def get_categories(self, scope, receive, send):
+        q = self.query_args(scope).get('q')
+
+        async def categories_list():
+            query = db.select(Category)
+            if q:
+                query = query.filter(Category.name.ilike(f'%{q}%'))
+
+            async with self.session() as session:
+                categories = (await session.scalars(query)).all()
+                counts = dict((await session.execute(
+                    db.select(Post.category_id, db.func.count(Post.id))
+                    .filter(Post.category_id.in_([c.id for c in categories]))
+                    .group_by(Post.category_id)
+                )).all())
+            return [c.to_dict(posts_count=counts.get(c.id, 0)) for c in categories]
+
+        # Тот же кэш и ключ, что и в routes/categories.py
+        await self.send_json(scope, send, await cache.aget_or_set('categories', q or '', categories_list))
+
+    async def stream_post_comments(self, scope, receive, send, post_id):
+        """
+        SSE-поток комментариев без занятого потока на каждое соединение
+        (см. routes/comments.py: stream_post_comments)
+        """
+        async with self.session() as session:
+            if await session.get(Post, post_id) is None:
+                return await self.not_found(scope, send)
+
+        headers = dict(scope['headers'])
+        last_event_id = headers.get(b'last-event-id', b'').decode('latin-1') or \
+            self.query_args(scope).get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            last_event_id = None
+
+        heartbeat = self.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+        subscription, backlog, complete = event_hub.subscribe(
+            comments_channel(post_id), last_event_id, loop=asyncio.get_running_loop())
+
+        async def wait_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        disconnected = asyncio.ensure_future(wait_disconnect())
+        try:
+            response_headers = self.response_headers(scope, b'text/event-stream; charset=utf-8')
+            response_headers += [(b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+            await send({'type': 'http.response.start', 'status': 200, 'headers': response_headers})
+
+            chunks = [f'retry: {int(heartbeat * 1000)}\n\n']
+            if not complete:
+                chunks.append('event: reset\ndata: {}\n\n')
+            sent = last_event_id or 0
+            for item in backlog:
+                sent = item[0]
+                chunks.append(sse_message(*item))
+            await send({'type': 'http.response.body', 'body': ''.join(chunks).encode('utf-8'), 'more_body': True})
+
+            while not subscription.overflowed:
+                getter = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait({getter, disconnected}, timeout=heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    getter.cancel()
+                    return
+                if getter in done:
+                    item = getter.result()
+                    if item[0] <= sent:
+                        continue
+                    chunk = sse_message(*item)
+                else:
+                    getter.cancel()
+                    chunk = ': heartbeat\n\n'
+                await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            disconnected.cancel()
+            subscription.close()
+
+
+app = AsyncApp(create_app())
@@ -0,0 +1,160 @@
+"""
+Сравнение пропускной способности читающих эндпоинтов: WSGI (app.py, threaded
+werkzeug-сервер, как app.run) против ASGI (asgi.py под uvicorn).
+
+Скрипт создаёт временную БД с тестовыми данными, по очереди поднимает оба
+сервера и гоняет по ним одинаковую смесь GET-запросов с заданной
+конкурентностью. Опция --sse держит открытыми N SSE-подключений во время
+замера (медленные клиенты / long-poll).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_asgi.py --concurrency 50 --requests 2000 --sse 200
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SERVERS = {
+    'wsgi': [sys.executable, '-c',
+             'import sys; from app import create_app; from werkzeug.serving import run_simple; '
+             'run_simple("127.0.0.1", int(sys.argv[1]), create_app(), threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--log-level', 'warning', '--port'],
+}
+
+
+def seed(database_url, posts, comments_per_post):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    from models import db, Role, User, Category, Post, Comment, ROLE_WRITER
+
+    app = create_app()
+    with app.app_context():
+        Role.ensure_defaults()
+        user = User(username='bench', email='bench@example.com', role=Role.query.filter_by(name=ROLE_WRITER).first())
+        user.set_password('bench')
+        db.session.add(user)
+        categories = [Category(name=f'category-{i}') for i in range(10)]
+        db.session.add_all(categories)
+        db.session.flush()
+
+        for i in range(posts):
+            post = Post(title=f'Post {i}', content='lorem ipsum ' * random.randint(10, 2000),
+                        user_id=user.id, category_id=categories[i % 10].id,
+                        comments_count=comments_per_post)
+            db.session.add(post)
+            db.session.flush()
+            db.session.add_all(Comment(text=f'comment {j}', post_id=post.id, author_id=user.id)
+                               for j in range(comments_per_post))
+        db.session.commit()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(port, '/api/categories')
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def request(port, path):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request('GET', path, headers={'Connection': 'close'})
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def open_sse(port, post_id):
+    """Открыть SSE-подключение и не читать его – «медленный клиент»"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f'GET /api/posts/{post_id}/comments/stream HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    return sock
+
+
+def run(name, port, args):
+    paths = []
+    for _ in range(args.requests):
+        post_id = random.randint(1, args.posts)
+        paths.append(random.choice([
+            '/api/posts?page=%d' % random.randint(1, 5),
+            '/api/posts?sort=comments_count&per_page=20',
+            f'/api/posts/{post_id}',
+            f'/api/posts/{post_id}/comments',
+            '/api/categories',
+        ]))
+
+    sse = [open_sse(port, random.randint(1, args.posts)) for _ in range(args.sse)]
+    try:
+        def timed(path):
+            started = time.perf_counter()
+            status = request(port, path)
+            return status, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(timed, paths))
+        elapsed = time.perf_counter() - started
+    finally:
+        for sock in sse:
+            sock.close()
+
+    latencies = sorted(latency for _, latency in results)
+    errors = sum(1 for status, _ in results if status != 200)
+    print(f'{name:5} {len(results) / elapsed:9.1f} req/s   '
+          f'p50 {statistics.median(latencies) * 1000:7.1f} ms   '
+          f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f} ms   '
+          f'errors {errors}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--sse', type=int, default=0, help='открытых SSE-подключений во время замера')
+    parser.add_argument('--posts', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=5, help='комментариев на пост')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_asgi_')
+    database_url = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    seed(database_url, args.posts, args.comments)
+
+    env = dict(os.environ, DATABASE_URL=database_url)
+    print(f'concurrency={args.concurrency} requests={args.requests} sse={args.sse} posts={args.posts}')
+    for name, command in SERVERS.items():
+        port = free_port()
+        server = subprocess.Popen(command + [str(port)], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port)
+            run(name, port, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,9 @@ import os
 from datetime import timedelta
 
 class Config:
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///blog.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///blog.db')
+    # Асинхронный движок для asgi.py; по умолчанию – та же БД через aiosqlite
+    ASYNC_SQLALCHEMY_DATABASE_URI = None
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # JWT настройки
     JWT_SECRET_KEY = 'super-secret'
@@ -11,4 +13,38 @@ class Config:
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
+    # Отзыв токенов: размер фильтра Блума (бит) и период синхронизации с БД (сек)
+    BLOCKLIST_BLOOM_SIZE = 1 << 20
+    BLOCKLIST_SYNC_SECONDS = 5
     PROPAGATE_EXCEPTIONS = True
+    CORS_ORIGINS = ["http://localhost:5173", "http://localhost:5000"]
+    # Максимальное количество постов в одном пакетном запросе
+    POSTS_BATCH_MAX_SIZE = 100
+    # Тексты постов длиннее порога (в байтах) хранятся сжатыми
+    POST_CONTENT_COMPRESS_THRESHOLD = 4096
+    # Трендовые посты
+    TRENDING_HALF_LIFE_HOURS = 24
+    TRENDING_WINDOW_HOURS = 24 * 7
+    TRENDING_REFRESH_SECONDS = 300
+    # SSE-поток комментариев
+    EVENTS_QUEUE_SIZE = 256
+    EVENTS_HISTORY_SIZE = 500
+    # Сколько каналов хранят буфер для возобновления по Last-Event-ID
+    EVENTS_HISTORY_CHANNELS = 1000
+    EVENTS_HEARTBEAT_SECONDS = 15
+    # Счётчики просмотров: запись в БД раз в N секунд или после M просмотров
+    VIEWS_FLUSH_SECONDS = 10
+    VIEWS_FLUSH_EVENTS = 1000
+    # Кэш: 'sqlite' – общий для воркеров файл (по умолчанию instance/cache.sqlite), 'memory' – LRU процесса
+    CACHE_BACKEND = 'sqlite'
+    CACHE_PATH = None
+    CACHE_LRU_SIZE = 1024
+    CACHE_DEFAULT_TTL = 300
+    # Подсказки пользователей (typeahead)
+    USERS_SUGGEST_LIMIT = 10
+    # Максимальный период /api/stats в днях
+    STATS_MAX_DAYS = 366
+    # Сколько пачек новых строк на таблицу догоняет сам запрос /api/stats (остальное – cron)
+    STATS_REQUEST_BATCHES = 2
+    # Ветки комментариев: максимальная глубина ответов
+    COMMENTS_MAX_DEPTH = 8
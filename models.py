@@ -1,4 +1,12 @@
+import sqlite3
+import zlib
+from datetime import datetime
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from utils.views import view_counter
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, create_refresh_token
 
@@ -23,17 +31,40 @@ class Role(db.Model):
 
 
 class User(db.Model):
+    # AUTOINCREMENT: id не переиспользуются – на этом держится водяной знак статистики
+    __table_args__ = {'sqlite_autoincrement': True}
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128))
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), index=True)
     is_active = db.Column(db.Boolean, default=True)
     role_id = db.Column(db.Integer, db.ForeignKey("role.id"))
+    # Версия токенов (claim "ver"): отзыв всех токенов увеличивает её на 1
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Нормализованные (lowercase) копии для поиска по префиксу через индекс,
+    # заполняются автоматически (см. index_user_search)
+    username_lower = db.Column(db.String(80), index=True)
+    email_lower = db.Column(db.String(120), index=True)
 
     posts = db.relationship('Post', backref='author', lazy=True)
     comments = db.relationship("Comment", backref="author", lazy=True)
 
+    @staticmethod
+    def rebuild_search_index():
+        """Заполнение username_lower/email_lower и триграмм для уже существующих пользователей"""
+        UserSearchGram.query.delete()
+        for user in User.query.all():
+            user.username_lower = user.username.strip().lower()
+            user.email_lower = user.email.strip().lower()
+            for gram in trigrams(user.username_lower, user.email_lower):
+                db.session.add(UserSearchGram(gram=gram, user_id=user.id))
+        db.session.flush()
+        UserSearchGramCount.recount()
+        db.session.commit()
+
     def set_password(self, password):
         """Установка хэшированного пароля"""
         self.password_hash = generate_password_hash(password)
@@ -44,9 +75,10 @@ class User(db.Model):
 
     def generate_tokens(self):
         """Генерация access и refresh токенов"""
+        claims = {'ver': self.token_version or 0}
         return {
-            'access_token': create_access_token(identity=str(self.id)),
-            'refresh_token': create_refresh_token(identity=str(self.id))
+            'access_token': create_access_token(identity=str(self.id), additional_claims=claims),
+            'refresh_token': create_refresh_token(identity=str(self.id), additional_claims=claims)
         }
 
     def can_comment(self): return self.role and self.role.name in [ROLE_COMMENTER, ROLE_WRITER, ROLE_ADMIN]
@@ -64,23 +96,111 @@ class User(db.Model):
         }
 
 
+class UserSearchGram(db.Model):
+    """Триграммный индекс username/email для поиска по подстроке"""
+    gram = db.Column(db.String(3), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True, index=True)
+
+
+class UserSearchGramCount(db.Model):
+    """Число пользователей с триграммой: поиск начинается с самой редкой из триграмм запроса"""
+    gram = db.Column(db.String(3), primary_key=True)
+    users = db.Column(db.Integer, nullable=False, default=0)
+
+    @staticmethod
+    def recount():
+        """Пересчёт по UserSearchGram (без commit)"""
+        UserSearchGramCount.query.delete()
+        db.session.execute(db.insert(UserSearchGramCount).from_select(
+            ['gram', 'users'],
+            db.select(UserSearchGram.gram, db.func.count()).group_by(UserSearchGram.gram)
+        ))
+
+
+def update_gram_counts(connection, added=(), removed=()):
+    table = UserSearchGramCount.__table__
+    if added:
+        insert = sqlite_insert(table).values([{'gram': g, 'users': 1} for g in added])
+        connection.execute(insert.on_conflict_do_update(
+            index_elements=['gram'], set_={'users': table.c.users + 1}))
+    if removed:
+        connection.execute(table.update().where(table.c.gram.in_(removed)).values(users=table.c.users - 1))
+
+
+def trigrams(*values):
+    grams = set()
+    for value in values:
+        value = value or ''
+        grams.update(value[i:i + 3] for i in range(len(value) - 2))
+    return grams
+
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def normalize_user_search(mapper, connection, user):
+    user.username_lower = (user.username or '').strip().lower()
+    user.email_lower = (user.email or '').strip().lower()
+
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+def index_user_search(mapper, connection, user):
+    """Пересборка триграмм пользователя при создании и смене username/email"""
+    state = db.inspect(user)
+    if state.attrs.username.history.has_changes() or state.attrs.email.history.has_changes():
+        table = UserSearchGram.__table__
+        old = set(connection.execute(db.select(table.c.gram).where(table.c.user_id == user.id)).scalars())
+        new = trigrams(user.username_lower, user.email_lower)
+        removed, added = old - new, new - old
+        if removed:
+            connection.execute(table.delete().where(table.c.user_id == user.id, table.c.gram.in_(removed)))
+        if added:
+            connection.execute(table.insert(), [{'gram': g, 'user_id': user.id} for g in added])
+        update_gram_counts(connection, added, removed)
+
+
+@event.listens_for(User, 'after_delete')
+def unindex_user_search(mapper, connection, user):
+    table = UserSearchGram.__table__
+    old = set(connection.execute(db.select(table.c.gram).where(table.c.user_id == user.id)).scalars())
+    if old:
+        connection.execute(table.delete().where(table.c.user_id == user.id))
+        update_gram_counts(connection, removed=old)
+
+
+class RevokedToken(db.Model):
+    """
+    Отозванный токен (jti) или отзыв всех токенов пользователя (jti = NULL,
+    недействительны токены с claim "ver" меньше token_version). См. utils/blocklist.py
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    token_type = db.Column(db.String(10))
+    token_version = db.Column(db.Integer)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
     posts = db.relationship("Post", back_populates="category", lazy=True)
 
-    def to_dict(self):
+    def to_dict(self, posts_count=None):
+        """posts_count можно передать заранее посчитанным, иначе посты подгружаются лениво"""
+        if posts_count is None:
+            posts_count = len(self.posts) if self.posts else 0
         return {
             "id": self.id,
             "name": self.name,
-            "posts_count": len(self.posts) if self.posts else 0
+            "posts_count": posts_count
         }
 
 
 class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
-    content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
 
@@ -91,6 +211,50 @@ class Post(db.Model):
     comments = db.relationship('Comment', backref='post', lazy=True, cascade="all, delete-orphan")
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Денормализованный счётчик комментариев (обновляется в routes/comments.py)
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Просмотры: пишутся пачками из utils/views.py
+    views = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Текст поста хранится отдельно (PostContent), чтобы строки списка оставались маленькими
+    body = db.relationship('PostContent', uselist=False, lazy='select', cascade='all, delete-orphan')
+
+    # Индексы под сортировки из POST_SORTS (routes/posts.py), id – для стабильного порядка
+    __table_args__ = (
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_post_updated_at_id', 'updated_at', 'id'),
+        db.Index('ix_post_title_id', 'title', 'id'),
+        db.Index('ix_post_comments_count_id', 'comments_count', 'id'),
+        db.Index('ix_post_views_id', 'views', 'id'),
+        db.Index('ix_post_category_created_at_id', 'category_id', 'created_at', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    @staticmethod
+    def recount_comments():
+        """Пересчёт денормализованного comments_count по таблице комментариев"""
+        counts = db.session.query(db.func.count(Comment.id)) \
+            .filter(Comment.post_id == Post.id).scalar_subquery()
+        # updated_at явно – пересчёт не правка поста, onupdate его не трогает
+        Post.query.update({Post.comments_count: counts, Post.updated_at: Post.updated_at},
+                          synchronize_session=False)
+        db.session.commit()
+
+    @property
+    def content(self):
+        return self.body.text if self.body else None
+
+    @content.setter
+    def content(self, value):
+        if self.body is not None and self.body.text == (value or ''):
+            return
+        if self.body is None:
+            self.body = PostContent()
+        if self.id is not None:
+            # Текст лежит в post_content: без явной правки строка post не обновится
+            self.updated_at = db.func.now()
+        self.body.text = value
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -98,7 +262,8 @@ class Post(db.Model):
             'content': self.content,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if self.updated_at else self.created_at.isoformat(),
-            'comments_count': len(self.comments),
+            'comments_count': self.comments_count or 0,
+            'views': (self.views or 0) + view_counter.pending(self.id),
             'author': self.author.username if self.author else None,
             'user_id': self.user_id,
             "author_role": self.author.role.name if self.author and self.author.role else None,
@@ -107,19 +272,126 @@ class Post(db.Model):
         }
 
 
+class PostContent(db.Model):
+    """
+    Текст поста (1:1 с Post). Тексты длиннее POST_CONTENT_COMPRESS_THRESHOLD байт
+    хранятся сжатыми zlib, распаковка прозрачна через свойство text
+    """
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    compressed = db.Column(db.Boolean, nullable=False, default=False)
+
+    @staticmethod
+    def decode(data, compressed):
+        if data is None:
+            return None
+        if compressed:
+            data = zlib.decompress(data)
+        return bytes(data).decode('utf-8')
+
+    @property
+    def text(self):
+        return PostContent.decode(self.data, self.compressed)
+
+    @text.setter
+    def text(self, value):
+        raw = (value or '').encode('utf-8')
+        threshold = current_app.config.get('POST_CONTENT_COMPRESS_THRESHOLD', 4096) if has_app_context() else 4096
+        packed = zlib.compress(raw) if len(raw) > threshold else raw
+        # Сжатие невыгодно – храним как есть
+        self.compressed = len(packed) < len(raw)
+        self.data = packed if self.compressed else raw
+
+    @staticmethod
+    def text_expr():
+        """SQL-выражение с распакованным текстом (для поиска по содержимому)"""
+        return db.func.post_content_text(PostContent.data, PostContent.compressed)
+
+
+@event.listens_for(Engine, 'connect')
+def register_sqlite_functions(dbapi_connection, connection_record):
+    """Функция post_content_text(data, compressed) для поиска по сжатым текстам"""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('post_content_text', 2, PostContent.decode, deterministic=True)
+
+
+# Ширина сегмента материализованного пути: id дополняется нулями,
+# чтобы лексикографический порядок путей совпадал с порядком отрисовки дерева
+COMMENT_PATH_WIDTH = 10
+COMMENT_PATH_SEPARATOR = '.'
+
+
 class Comment(db.Model):
+    __table_args__ = (
+        # Поддерево = диапазон путей внутри поста, уже упорядоченный для отрисовки
+        db.Index('ix_comment_post_path', 'post_id', 'path'),
+        db.Index('ix_comment_post_parent_path', 'post_id', 'parent_id', 'path'),
+        {'sqlite_autoincrement': True},
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), index=True)
 
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False, index=True)
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    # Ветки ответов: путь от корня ветки вида "0000000012.0000000034"
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'))
+    path = db.Column(db.String(255))
+    depth = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def assign_path(self, parent=None):
+        """Заполнить path/depth (id уже должен быть получен через flush)"""
+        if parent is not None and parent.path is None:
+            # Комментарий из БД до появления веток – всегда верхнего уровня
+            parent.assign_path()
+        segment = str(self.id).zfill(COMMENT_PATH_WIDTH)
+        self.path = parent.path + COMMENT_PATH_SEPARATOR + segment if parent else segment
+        self.depth = parent.depth + 1 if parent else 0
+
+    def subtree_filter(self):
+        """Условие "комментарий и все ответы на него" – один диапазон по индексу"""
+        if self.path is None:
+            # Комментарий без пути (до backfill-comment-paths) – ответов у него нет
+            return Comment.id == self.id
+        upper = self.path + chr(ord(COMMENT_PATH_SEPARATOR) + 1)
+        return db.and_(Comment.post_id == self.post_id, Comment.path >= self.path, Comment.path < upper)
+
+    @staticmethod
+    def backfill_paths():
+        """Заполнение path/depth у комментариев, созданных до появления веток"""
+        parents = {}
+        for comment in Comment.query.order_by(Comment.id).all():
+            if comment.path is None:
+                comment.assign_path(parents.get(comment.parent_id))
+            parents[comment.id] = comment
+        db.session.commit()
+
     def to_dict(self):
         return {
             'id': self.id,
             'text': self.text,
             'created_at': self.created_at.isoformat(),
-            'post_id': self.post_id
+            'post_id': self.post_id,
+            'parent_id': self.parent_id,
+            'depth': self.depth or 0
         }
 
+
+
+class DailyStat(db.Model):
+    """
+    Дневные агрегаты для /api/stats. key – ID категории/автора
+    для разрезов (0 – итог по всем). Заполняются в utils/stats.py
+    """
+    day = db.Column(db.Date, primary_key=True)
+    metric = db.Column(db.String(30), primary_key=True)
+    key = db.Column(db.Integer, primary_key=True, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class StatsWatermark(db.Model):
+    """Последний учтённый в DailyStat id по каждой исходной таблице"""
+    source = db.Column(db.String(30), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,20 @@
+# routes/admin.py
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from utils.cache import cache
+
+admin_bp = Blueprint("admin", __name__)
+
+
+@admin_bp.route("/cache/stats", methods=["GET"])
+@jwt_required()
+def cache_stats():
+    """
+    Статистика кэша (попадания / промахи) текущего воркера.
+    Доступ: только admin.
+    """
+    user = User.query.get_or_404(int(get_jwt_identity()))
+    if not user.is_admin():
+        return jsonify({"error": "Access denied"}), 403
+    return jsonify(cache.stats())
@@ -1,13 +1,18 @@
 # routes/auth.py
-from flask import Blueprint, request, jsonify
-from models import db, User, Role
+from flask import Blueprint, request, jsonify, current_app
+from models import db, User, Role, UserSearchGram, UserSearchGramCount, trigrams
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
     jwt_required,
+    get_jwt,
     get_jwt_identity,
+    decode_token,
     verify_jwt_in_request
 )
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from utils.blocklist import blocklist
 from utils.validators import validate_user_data
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import ROLE_COMMENTER, ROLE_WRITER, ROLE_ADMIN
@@ -115,13 +120,68 @@ def refresh():
     if not user or not user.is_active:
         return jsonify({'error': 'Invalid token'}), 401
 
-    new_access_token = create_access_token(identity=current_user_id)
+    new_access_token = create_access_token(identity=current_user_id,
+                                           additional_claims={'ver': user.token_version or 0})
 
     return jsonify({
         'access_token': new_access_token
     })
 
 
+def max_token_lifetime():
+    return max(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'], current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Выход: отзыв текущего токена (access или refresh).
+    Body (опционально): { "refresh_token": "..." } – отозвать и его
+    """
+    current_user_id = int(get_jwt_identity())
+    data = request.get_json(silent=True) or {}
+
+    refresh_token = data.get('refresh_token')
+    if refresh_token:
+        try:
+            refresh_payload = decode_token(refresh_token)
+        except (PyJWTError, JWTExtendedException):
+            return jsonify({'error': 'Invalid refresh token'}), 400
+        if refresh_payload.get('type') != 'refresh':
+            return jsonify({'error': 'Invalid refresh token'}), 400
+        if int(refresh_payload['sub']) != current_user_id:
+            return jsonify({'error': 'Access denied'}), 403
+        blocklist.revoke(refresh_payload)
+
+    blocklist.revoke(get_jwt())
+    return jsonify({'message': 'Logout successful'})
+
+
+@auth_bp.route('/logout/all', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout_all():
+    """Выход на всех устройствах: отзыв всех выданных пользователю токенов"""
+    blocklist.revoke_all(int(get_jwt_identity()), max_token_lifetime())
+    return jsonify({'message': 'All tokens revoked'})
+
+
+@auth_bp.route('/users/<int:user_id>/revoke', methods=['POST'])
+@jwt_required()
+def revoke_user_tokens(user_id):
+    """
+    Отзыв всех токенов пользователя.
+    Доступ: только admin.
+    """
+    current_user = User.query.get_or_404(int(get_jwt_identity()))
+    if not current_user.is_admin():
+        return jsonify({"error": "Access denied"}), 403
+
+    user = User.query.get_or_404(user_id)
+    blocklist.revoke_all(user.id, max_token_lifetime())
+    return jsonify({"message": "Tokens revoked", "user": user.to_dict()})
+
+
 @auth_bp.route('/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
@@ -173,10 +233,90 @@ def set_role():
     }), 200
 
 
+# Сколько триграмм кроме самой редкой проверяется по индексу (остальное отсеет LIKE)
+SEARCH_GRAMS_CHECKED = 3
+
+
+def prefix_filter(column, prefix):
+    """Поиск по префиксу диапазоном – всегда идёт по индексу, в отличие от LIKE"""
+    return db.and_(column >= prefix, column < prefix + '\uffff')
+
+
+def user_search_filter(q):
+    """
+    Условие поиска пользователей по подстроке username/email.
+    Короткие запросы (< 3 символов) – по префиксу, длинные – через триграммный
+    индекс: кандидаты берутся из самой редкой триграммы запроса, наличие ещё
+    нескольких проверяется по первичному ключу, затем точная проверка подстрокой
+    """
+    q = q.strip().lower()
+    grams = trigrams(q)
+    if not grams:
+        return db.or_(prefix_filter(User.username_lower, q), prefix_filter(User.email_lower, q))
+
+    counts = dict(db.session.query(UserSearchGramCount.gram, UserSearchGramCount.users)
+                  .filter(UserSearchGramCount.gram.in_(grams)).all())
+    # Триграммы нет ни у кого – совпадений нет
+    if len(counts) < len(grams) or not all(counts.values()):
+        return db.false()
+
+    rarest, *others = sorted(grams, key=counts.get)
+    candidates = db.select(UserSearchGram.user_id).filter(UserSearchGram.gram == rarest)
+    for gram in others[:SEARCH_GRAMS_CHECKED]:
+        other = db.aliased(UserSearchGram)
+        candidates = candidates.filter(
+            db.exists().where(other.gram == gram, other.user_id == UserSearchGram.user_id))
+    return db.and_(
+        User.id.in_(candidates),
+        db.or_(User.username_lower.contains(q, autoescape=True), User.email_lower.contains(q, autoescape=True))
+    )
+
+
+@auth_bp.route('/users/suggest', methods=['GET'])
+@jwt_required()
+def suggest_users():
+    """
+    Подсказки пользователей для поиска в админке (только админ).
+    Сначала совпадения по префиксу username, затем email, затем по подстроке.
+    """
+    current_user = User.query.get_or_404(int(get_jwt_identity()))
+    if not current_user.is_admin():
+        return jsonify({"error": "Access denied"}), 403
+
+    q = (request.args.get('q') or '').strip().lower()
+    max_limit = current_app.config['USERS_SUGGEST_LIMIT']
+    limit = min(max(request.args.get('limit', max_limit, type=int), 1), max_limit)
+    if not q:
+        return jsonify({"users": []})
+
+    found = []
+    seen = set()
+
+    def collect(query):
+        query = query.with_entities(User.id, User.username, User.email)
+        if seen:
+            query = query.filter(User.id.notin_(seen))
+        for user_id, username, email in query.limit(limit - len(found)).all():
+            seen.add(user_id)
+            found.append({"id": user_id, "username": username, "email": email})
+
+    collect(User.query.filter(prefix_filter(User.username_lower, q)).order_by(User.username_lower))
+    if len(found) < limit:
+        collect(User.query.filter(prefix_filter(User.email_lower, q)).order_by(User.email_lower))
+    if len(found) < limit and len(q) >= 3:
+        collect(User.query.filter(user_search_filter(q)).order_by(User.username_lower))
+
+    return jsonify({"users": found})
+
+
 @auth_bp.route('/users', methods=['GET'])
 @jwt_required()
 def list_users():
-    """Список пользователей (только админ), с фильтром и пагинацией"""
+    """
+    Список пользователей (только админ), с фильтром и пагинацией
+    - q: подстрока username/email; запросы из 1–2 символов ищутся
+      только по началу username/email (префикс), от 3 символов – по подстроке
+    """
     current_user = User.query.get_or_404(int(get_jwt_identity()))
     if not current_user.is_admin():
         return jsonify({"error": "Access denied"}), 403
@@ -187,7 +327,7 @@ def list_users():
 
     query = User.query
     if q:
-        query = query.filter(db.or_(User.username.ilike(f'%{q}%'), User.email.ilike(f'%{q}%')))
+        query = query.filter(user_search_filter(q))
     query = query.order_by(db.desc(User.created_at))
 
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -1,17 +1,33 @@
 # routes/categories.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import selectinload
 from models import db, Category, User, Post
+from utils.cache import cache
 
 categories_bp = Blueprint("categories", __name__)
 
-@categories_bp.route("/", methods=["GET"])
-def get_categories():
-    q = request.args.get("q")
+
+def categories_list(q=None):
+    """Список категорий с количеством постов (одним GROUP BY вместо загрузки постов)"""
     query = Category.query
     if q:
         query = query.filter(Category.name.ilike(f"%{q}%"))
-    return jsonify([c.to_dict() for c in query.all()])
+    categories = query.all()
+    counts = dict(
+        db.session.query(Post.category_id, db.func.count(Post.id))
+        .filter(Post.category_id.in_([c.id for c in categories]))
+        .group_by(Post.category_id)
+        .all()
+    )
+    return [c.to_dict(posts_count=counts.get(c.id, 0)) for c in categories]
+
+
+@categories_bp.route("/", methods=["GET"])
+def get_categories():
+    q = request.args.get("q")
+    # Кэш сбрасывается при изменении категорий и постов (posts_count)
+    return jsonify(cache.get_or_set("categories", q or "", lambda: categories_list(q)))
 
 @categories_bp.route("/", methods=["POST"])
 @jwt_required()
@@ -23,6 +39,7 @@ def create_category():
     category = Category(name=data["name"])
     db.session.add(category)
     db.session.commit()
+    cache.invalidate("categories")
     return jsonify(category.to_dict()), 201
 
 
@@ -38,7 +55,9 @@ def get_category_posts(cat_id):
     per_page = request.args.get('per_page', 10, type=int)
 
     # Запрос постов категории
-    posts_query = Post.query.filter_by(category_id=cat_id).order_by(Post.created_at.desc())
+    posts_query = Post.query.filter_by(category_id=cat_id) \
+        .order_by(Post.created_at.desc(), Post.id.desc()) \
+        .options(selectinload(Post.body))
 
     # Пагинация
     pagination = posts_query.paginate(page=page, per_page=per_page, error_out=False)
@@ -63,6 +82,7 @@ def update_category(cat_id):
     data = request.get_json()
     category.name = data.get("name", category.name)
     db.session.commit()
+    cache.invalidate("categories")
     return jsonify(category.to_dict())
 
 @categories_bp.route("/<int:cat_id>", methods=["DELETE"])
@@ -74,4 +94,5 @@ def delete_category(cat_id):
     category = Category.query.get_or_404(cat_id)
     db.session.delete(category)
     db.session.commit()
+    cache.invalidate("categories")
     return jsonify({"message": "Deleted"})
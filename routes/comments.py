@@ -1,18 +1,115 @@
 # comments.py
-from flask import Blueprint, request, jsonify
-from models import db, Post, Comment, User
+from flask import Blueprint, request, jsonify, Response, current_app
+from models import db, Post, Comment, User, COMMENT_PATH_SEPARATOR
 from sqlalchemy.exc import IntegrityError
 from utils.validators import validate_comment_data
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.trending import trending
+from utils.pubsub import event_hub
 
 comments_bp = Blueprint('comments', __name__)
 
 # ✅ Список комментариев к посту (больше не конфликтует с get_post)
 @comments_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
 def get_post_comments(post_id):
+    """
+    Комментарии поста в порядке отрисовки дерева (у каждого parent_id и depth)
+    - root_id: только ветка этого комментария (включая его самого)
+    - max_depth: сколько уровней ответов показывать под верхним уровнем
+    - page, per_page: пагинация по веткам верхнего уровня (или по прямым
+      ответам root_id); ответ тогда – объект с comments/total/pages/current_page
+    """
+    Post.query.get_or_404(post_id)
+
+    root = None
+    root_id = request.args.get('root_id', type=int)
+    if root_id is not None:
+        root = Comment.query.filter_by(id=root_id, post_id=post_id).first_or_404()
+
+    max_depth = request.args.get('max_depth', type=int)
+    base_depth = root.depth if root else 0
+    depth_filter = Comment.depth <= base_depth + max_depth if max_depth is not None and max_depth >= 0 else None
+
+    query = Comment.query.filter(root.subtree_filter() if root else Comment.post_id == post_id)
+    if depth_filter is not None:
+        query = query.filter(depth_filter)
+
+    if 'page' not in request.args:
+        return jsonify([c.to_dict() for c in query.order_by(Comment.path).all()])
+
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    # Страница веток: узлы верхнего уровня, затем все их поддеревья одним диапазоном путей
+    threads = Comment.query.filter_by(post_id=post_id, parent_id=root.id if root else None)
+    total = threads.count()
+    page_threads = threads.order_by(Comment.path).offset((page - 1) * per_page).limit(per_page).all()
+
+    comments = []
+    if page_threads:
+        first, last = page_threads[0], page_threads[-1]
+        comments = query.filter(
+            Comment.path >= first.path,
+            Comment.path < last.path + chr(ord(COMMENT_PATH_SEPARATOR) + 1)
+        ).order_by(Comment.path).all()
+
+    return jsonify({
+        'comments': [c.to_dict() for c in comments],
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'current_page': page
+    })
+
+
+def comments_channel(post_id):
+    return f'post:{post_id}:comments'
+
+
+def sse_message(event_id, name, data):
+    return f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
+
+
+# ✅ SSE-поток новых, изменённых и удалённых комментариев поста
+@comments_bp.route('/posts/<int:post_id>/comments/stream', methods=['GET'])
+def stream_post_comments(post_id):
+    """
+    События: comment_created, comment_updated, comment_deleted.
+    Поддерживается возобновление по заголовку Last-Event-ID (или ?last_event_id=).
+    Если пропущенные события уже вытеснены из буфера, приходит событие reset –
+    клиенту нужно перечитать GET /posts/<id>/comments
+    """
     Post.query.get_or_404(post_id)
-    comments = Comment.query.filter_by(post_id=post_id).all()
-    return jsonify([c.to_dict() for c in comments])
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+    subscription, backlog, complete = event_hub.subscribe(comments_channel(post_id), last_event_id)
+
+    def generate():
+        try:
+            yield f'retry: {int(heartbeat * 1000)}\n\n'
+            if not complete:
+                yield 'event: reset\ndata: {}\n\n'
+            sent = last_event_id or 0
+            for event in backlog:
+                sent = event[0]
+                yield sse_message(*event)
+            while not subscription.overflowed:
+                event = subscription.get(timeout=heartbeat)
+                if event is None:
+                    yield ': heartbeat\n\n'
+                elif event[0] > sent:
+                    yield sse_message(*event)
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 # ✅ Создание комментария к посту
 @comments_bp.route('/posts/<int:post_id>/comments', methods=['POST'])
@@ -29,14 +126,32 @@ def create_comment(post_id):
     if not is_valid:
         return jsonify({'errors': errors}), 400
 
+    # Ответ на комментарий того же поста с ограничением глубины
+    parent = None
+    parent_id = data.get('parent_id')
+    if parent_id is not None:
+        parent = Comment.query.filter_by(id=parent_id, post_id=post_id).first()
+        if not parent:
+            return jsonify({'error': 'Parent comment not found'}), 400
+        if parent.depth + 1 > current_app.config['COMMENTS_MAX_DEPTH']:
+            return jsonify({'error': 'Maximum reply depth reached'}), 400
+
     try:
         text = (data.get("text") or "").strip()
         if not text:
             return jsonify({"error": "text is required"}), 400
-        new_comment = Comment(text=text, post_id=post_id, author_id=user_id)
+        new_comment = Comment(text=text, post_id=post_id, author_id=user_id, parent_id=parent_id)
         db.session.add(new_comment)
+        db.session.flush()
+        new_comment.assign_path(parent)
+        # updated_at явно – иначе onupdate отметил бы пост как отредактированный
+        Post.query.filter_by(id=post_id).update({Post.comments_count: Post.comments_count + 1,
+                                                 Post.updated_at: Post.updated_at})
         db.session.commit()
-        return jsonify(new_comment.to_dict()), 201
+        trending.add_comment(post_id, new_comment.id, new_comment.created_at)
+        payload = new_comment.to_dict()
+        event_hub.publish(comments_channel(post_id), 'comment_created', payload)
+        return jsonify(payload), 201
     except IntegrityError:
         db.session.rollback()
         return jsonify({'error': 'Database error'}), 500
@@ -45,7 +160,7 @@ def create_comment(post_id):
 @jwt_required()
 def delete_comment(comment_id):
     """
-    Удаление комментария — доступно автору, admin и writer
+    Удаление комментария вместе со всеми ответами на него — доступно автору, admin и writer
     """
     comment = Comment.query.get_or_404(comment_id)
     user = User.query.get_or_404(int(get_jwt_identity()))
@@ -56,8 +171,18 @@ def delete_comment(comment_id):
         return jsonify({"error": "Access denied"}), 403
 
     try:
-        db.session.delete(comment)
+        post_id = comment.post_id
+        # Ветка целиком – одним диапазонным запросом по пути
+        subtree = db.session.query(Comment.id, Comment.created_at).filter(comment.subtree_filter()).all()
+        deleted_ids = [row.id for row in subtree]
+        Comment.query.filter(Comment.id.in_(deleted_ids)).delete(synchronize_session=False)
+        Post.query.filter_by(id=post_id).update({Post.comments_count: Post.comments_count - len(deleted_ids),
+                                                 Post.updated_at: Post.updated_at})
         db.session.commit()
+        for row in subtree:
+            trending.remove_comment(post_id, row.id, row.created_at)
+        event_hub.publish(comments_channel(post_id), 'comment_deleted',
+                          {'id': comment_id, 'post_id': post_id, 'deleted_ids': deleted_ids})
         return jsonify({'message': 'Comment deleted successfully'})
     except IntegrityError:
         db.session.rollback()
@@ -85,4 +210,6 @@ def update_comment(comment_id):
     comment.text = new_text
     db.session.commit()
 
-    return jsonify({"message": "Comment updated successfully", "comment": comment.to_dict()})
+    payload = comment.to_dict()
+    event_hub.publish(comments_channel(comment.post_id), 'comment_updated', payload)
+    return jsonify({"message": "Comment updated successfully", "comment": payload})
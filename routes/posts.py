@@ -1,65 +1,169 @@
-from flask import Blueprint, request, jsonify
-from models import db, Post, User, Category
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Post, PostContent, User, Category
 from sqlalchemy.exc import IntegrityError
 from utils.validators import validate_post_data
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from utils.trending import trending
+from utils.views import view_counter
+from utils.cache import cache
 
 posts_bp = Blueprint('posts', __name__)
 
+# Разрешённые ключи сортировки списка постов.
+# Каждому соответствует индекс (см. Post.__table_args__), id – для стабильного порядка
+POST_SORTS = {
+    'created_at': Post.created_at,
+    'updated_at': Post.updated_at,
+    'title': Post.title,
+    'comments_count': Post.comments_count,
+    'views': Post.views,
+    'id': Post.id,
+}
+
+
+def sort_clauses(sort_by, sort_order):
+    """
+    ORDER BY для ключа из POST_SORTS
+    Возвращает tuple: (clauses, error)
+    """
+    field = POST_SORTS.get(sort_by)
+    if field is None:
+        return None, f"sort must be one of: {', '.join(POST_SORTS)}"
+    if sort_order not in ('asc', 'desc'):
+        return None, 'order must be asc or desc'
+
+    direction = db.desc if sort_order == 'desc' else db.asc
+    if field is Post.id:
+        return [direction(Post.id)], None
+    return [direction(field), direction(Post.id)], None
+
+
+def post_load_options():
+    """Жадная загрузка связей, нужных Post.to_dict(), без N+1 запросов"""
+    return (
+        joinedload(Post.author).joinedload(User.role),
+        joinedload(Post.category),
+        selectinload(Post.body),
+    )
+
+
+def posts_select(args):
+    """
+    Построение запроса списка постов по параметрам query string
+    (общий для WSGI-маршрута и асинхронного asgi.py)
+    Возвращает tuple: (select, error)
+    """
+    query = db.select(Post)
+
+    # Фильтрация по заголовку
+    title_filter = args.get('title')
+    if title_filter:
+        query = query.filter(Post.title.ilike(f'%{title_filter}%'))
+
+    # Поиск по содержимому (только здесь нужна таблица с текстами)
+    search_query = args.get('q')
+    if search_query:
+        query = query.outerjoin(PostContent).filter(
+            db.or_(
+                Post.title.ilike(f'%{search_query}%'),
+                PostContent.text_expr().ilike(f'%{search_query}%')
+            )
+        )
+
+    # Фильтрация по категории (ID)
+    category_id = args.get('category_id')
+    if category_id:
+        query = query.filter(Post.category_id == category_id)
+
+    # Фильтрация по названию категории
+    category_name = args.get('category_name')
+    if category_name:
+        query = query.join(Category).filter(Category.name.ilike(f'%{category_name}%'))
+
+    # Сортировка только по объявленным ключам
+    clauses, error = sort_clauses(args.get('sort', 'created_at'), args.get('order', 'desc'))
+    if error:
+        return None, error
+
+    # Связи и тексты подгружаются только для постов текущей страницы
+    return query.order_by(*clauses).options(*post_load_options()), None
+
+
+def load_posts(ids):
+    """
+    Загрузка постов по списку ID одним запросом
+    вместе с автором, ролью и категорией.
+    Возвращает словарь {post_id: post_dict}
+    """
+    ids = list(set(ids))
+    if not ids:
+        return {}
+
+    posts = Post.query.options(*post_load_options()).filter(Post.id.in_(ids)).all()
+
+    return {post.id: post.to_dict() for post in posts}
+
+
+def parse_ids(raw, max_size):
+    """
+    Разбор списка ID ('1,2,3' или [1, 2, 3]) с сохранением порядка и без повторов
+    Возвращает tuple: (ids, error)
+    """
+    if isinstance(raw, str):
+        raw = [part.strip() for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list):
+        return None, 'ids must be a list of integers'
+    # Лимит проверяется до разбора, чтобы не обрабатывать заведомо лишнее
+    if len(raw) > max_size:
+        return None, f'Too many ids, maximum is {max_size}'
+
+    ids = []
+    seen = set()
+    for value in raw:
+        try:
+            post_id = int(value)
+        except (TypeError, ValueError):
+            return None, f'Invalid post id: {value}'
+        if post_id not in seen:
+            seen.add(post_id)
+            ids.append(post_id)
+
+    if not ids:
+        return None, 'ids must not be empty'
+    return ids, None
+
+
+def batch_response(ids):
+    """Ответ пакетной выборки: посты в порядке запроса и список ненайденных ID"""
+    found = load_posts(ids)
+    return jsonify({
+        'posts': [found[post_id] for post_id in ids if post_id in found],
+        'missing': [post_id for post_id in ids if post_id not in found]
+    })
+
 
 @posts_bp.route('/posts', methods=['GET'])
 def get_posts():
 
+    # Пакетная выборка: /api/posts?ids=1,2,3
+    if 'ids' in request.args:
+        ids, error = parse_ids(request.args.get('ids'), current_app.config['POSTS_BATCH_MAX_SIZE'])
+        if error:
+            return jsonify({'error': error}), 400
+        return batch_response(ids)
+
     try:
         # Получаем параметры из query string
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
 
-        # Начинаем построение запроса
-        query = Post.query
-
-        # Фильтрация по заголовку
-        title_filter = request.args.get('title')
-        if title_filter:
-            query = query.filter(Post.title.ilike(f'%{title_filter}%'))
-
-        # Поиск по содержимому
-        search_query = request.args.get('q')
-        if search_query:
-            query = query.filter(
-                db.or_(
-                    Post.title.ilike(f'%{search_query}%'),
-                    Post.content.ilike(f'%{search_query}%')
-                )
-            )
-
-        # Фильтрация по категории (ID)
-        category_id = request.args.get('category_id')
-        if category_id:
-            query = query.filter(Post.category_id == category_id)
-
-        # Фильтрация по названию категории
-        category_name = request.args.get('category_name')
-        if category_name:
-            query = query.join(Category).filter(Category.name.ilike(f'%{category_name}%'))
-
-        # Сортировка
-        sort_by = request.args.get('sort', 'created_at')
-        sort_order = request.args.get('order', 'desc')
-
-        # Проверяем, существует ли поле для сортировки в модели
-        if hasattr(Post, sort_by):
-            field = getattr(Post, sort_by)
-            if sort_order == 'desc':
-                query = query.order_by(db.desc(field))
-            else:
-                query = query.order_by(field)
-        else:
-            # Если поле не существует, используем сортировку по умолчанию
-            query = query.order_by(db.desc(Post.created_at))
+        query, error = posts_select(request.args)
+        if error:
+            return jsonify({'error': error}), 400
 
         # Применяем пагинацию
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        pagination = db.paginate(query, page=page, per_page=per_page, error_out=False)
         posts = pagination.items
 
         # Формируем ответ
@@ -199,6 +303,7 @@ def create_post():
         )
         db.session.add(new_post)
         db.session.commit()
+        cache.invalidate('categories')
 
         # Возвращаем созданный пост
         return jsonify(new_post.to_dict()), 201
@@ -208,12 +313,54 @@ def create_post():
         return jsonify({'error': 'Database error'}), 500
 
 
+@posts_bp.route('/posts/batch', methods=['POST'])
+def get_posts_batch():
+    """
+    Пакетная выборка постов по ID (для длинных списков)
+    Body: { "ids": [1, 2, 3] }
+    """
+    data = request.get_json(silent=True) or {}
+    ids, error = parse_ids(data.get('ids'), current_app.config['POSTS_BATCH_MAX_SIZE'])
+    if error:
+        return jsonify({'error': error}), 400
+    return batch_response(ids)
+
+
+@posts_bp.route('/posts/trending', methods=['GET'])
+def get_trending_posts():
+    """
+    Трендовые посты – по активности комментариев с затуханием по времени
+    - limit: количество постов (по умолчанию 10, максимум 50)
+    - offset: смещение
+    """
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    ranked = trending.top(limit=limit, offset=offset)
+    if not ranked:
+        return jsonify({'posts': []})
+
+    # Пакетная загрузка по первичному ключу, порядок берём из рейтинга
+    posts = load_posts([post_id for post_id, _ in ranked])
+
+    result = []
+    for post_id, score in ranked:
+        item = posts.get(post_id)
+        if item is None:
+            continue
+        item['trending_score'] = round(score, 4)
+        result.append(item)
+
+    return jsonify({'posts': result})
+
+
 @posts_bp.route('/posts/<int:post_id>', methods=['GET'])
 def get_post(post_id):
     """
     Получение конкретного поста по ID
     """
     post = Post.query.get_or_404(post_id)
+    view_counter.hit(post_id)
     return jsonify(post.to_dict())
 
 
@@ -264,6 +411,7 @@ def update_post(post_id):
             post.category_id = category_id
 
         db.session.commit()
+        cache.invalidate('categories')
 
         return jsonify(post.to_dict())
 
@@ -293,6 +441,8 @@ def delete_post(post_id):
     try:
         db.session.delete(post)
         db.session.commit()
+        trending.discard(post_id)
+        cache.invalidate('categories')
         return jsonify({'message': 'Post deleted successfully'})
 
     except IntegrityError:
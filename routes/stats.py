@@ -0,0 +1,89 @@
+# routes/stats.py
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, User, Category, DailyStat
+from utils.stats import catch_up
+
+stats_bp = Blueprint("stats", __name__)
+
+
+@stats_bp.route("/", methods=["GET"])
+@jwt_required()
+def get_stats():
+    """
+    Статистика для админки по дневным агрегатам (только админ).
+    - days: период в днях, включая сегодня (по умолчанию 30, максимум STATS_MAX_DAYS)
+    - top: количество авторов в топе (по умолчанию 10)
+    """
+    user = User.query.get_or_404(int(get_jwt_identity()))
+    if not user.is_admin():
+        return jsonify({"error": "Access denied"}), 403
+
+    days = min(max(request.args.get("days", 30, type=int), 1), current_app.config["STATS_MAX_DAYS"])
+    top = min(max(request.args.get("top", 10, type=int), 1), 100)
+
+    # Догоняем свежие строки новее водяного знака; большой бэклог – дело flask stats-catch-up
+    catch_up(max_batches=current_app.config["STATS_REQUEST_BATCHES"])
+
+    date_to = datetime.utcnow().date()
+    date_from = date_to - timedelta(days=days - 1)
+    in_period = DailyStat.day.between(date_from, date_to)
+
+    # По дням
+    daily = {date_from + timedelta(days=i): {"posts": 0, "comments": 0, "users": 0} for i in range(days)}
+    rows = db.session.query(DailyStat.day, DailyStat.metric, DailyStat.count) \
+        .filter(in_period, DailyStat.metric.in_(("posts", "comments", "users"))).all()
+    for day, metric, count in rows:
+        daily[day][metric] = count
+
+    def totals_by_key(metric, limit=None):
+        query = db.session.query(DailyStat.key, db.func.sum(DailyStat.count).label("total")) \
+            .filter(in_period, DailyStat.metric == metric) \
+            .group_by(DailyStat.key) \
+            .order_by(db.desc("total"), DailyStat.key)
+        if limit:
+            query = query.limit(limit)
+        return dict(query.all())
+
+    # По категориям (0 – посты без категории)
+    category_posts = totals_by_key("category_posts")
+    category_comments = totals_by_key("category_comments")
+    category_ids = set(category_posts) | set(category_comments)
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_(category_ids)).all())
+    categories = sorted((
+        {
+            "category_id": cat_id or None,
+            "category_name": names.get(cat_id),
+            "posts": category_posts.get(cat_id, 0),
+            "comments": category_comments.get(cat_id, 0),
+        }
+        for cat_id in category_ids
+    ), key=lambda c: (-(c["posts"] + c["comments"]), c["category_id"] or 0))
+
+    # Топ авторов по постам, с их комментариями за период
+    author_posts = totals_by_key("author_posts", limit=top)
+    author_comments = dict(
+        db.session.query(DailyStat.key, db.func.sum(DailyStat.count))
+        .filter(in_period, DailyStat.metric == "author_comments", DailyStat.key.in_(author_posts))
+        .group_by(DailyStat.key)
+        .all()
+    )
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(author_posts)).all())
+    top_authors = [
+        {
+            "user_id": user_id,
+            "username": usernames.get(user_id),
+            "posts": posts,
+            "comments": author_comments.get(user_id, 0),
+        }
+        for user_id, posts in author_posts.items()
+    ]
+
+    return jsonify({
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "daily": [{"date": day.isoformat(), **counts} for day, counts in daily.items()],
+        "categories": categories,
+        "top_authors": top_authors
+    })
@@ -0,0 +1,67 @@
+import pytest
+
+from app import create_app
+from models import db, User, Role, ROLE_ADMIN
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'CACHE_BACKEND': 'memory',
+    }
+
+
+@pytest.fixture
+def app(app_config):
+    app = create_app(app_config)
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def restart(app_config):
+    """Новое приложение с той же БД – как перезапуск процесса"""
+    def restart():
+        return create_app(app_config)
+    return restart
+
+
+@pytest.fixture
+def auth():
+    """Заголовок Authorization для токена"""
+    def auth(token):
+        return {'Authorization': f'Bearer {token}'}
+    return auth
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """Регистрация пользователя, возвращает ответ /register (user и tokens)"""
+    def register(username, password='secret'):
+        response = client.post('/api/auth/register', json={
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': password,
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return register
+
+
+@pytest.fixture
+def admin(app, register):
+    """Пользователь с ролью admin (ответ /register)"""
+    data = register('admin')
+    with app.app_context():
+        user = db.session.get(User, data['user']['id'])
+        user.role = Role.query.filter_by(name=ROLE_ADMIN).first()
+        db.session.commit()
+    return data
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from flask_jwt_extended import decode_token
+
+from models import db, RevokedToken
+
+
+def login(client, username, password='secret'):
+    response = client.post('/api/auth/login', json={'login': username, 'password': password})
+    assert response.status_code == 200
+    return response.get_json()['tokens']
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, register, auth):
+    tokens = register('bob')['tokens']
+
+    response = client.post('/api/auth/logout', headers=auth(tokens['access_token']),
+                           json={'refresh_token': tokens['refresh_token']})
+    assert response.status_code == 200
+
+    assert client.get('/api/auth/profile', headers=auth(tokens['access_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=auth(tokens['refresh_token'])).status_code == 401
+
+
+def test_logout_rejects_invalid_refresh_token(client, register, auth):
+    tokens = register('bob')['tokens']
+
+    for bad in ('garbage', 'a.b.c', 123, tokens['access_token']):
+        response = client.post('/api/auth/logout', headers=auth(tokens['access_token']),
+                               json={'refresh_token': bad})
+        assert response.status_code == 400, bad
+
+    # Неудачный logout ничего не отзывает
+    assert client.get('/api/auth/profile', headers=auth(tokens['access_token'])).status_code == 200
+
+
+def test_logout_rejects_foreign_refresh_token(client, register, auth):
+    bob = register('bob')['tokens']
+    eve = register('eve')['tokens']
+
+    response = client.post('/api/auth/logout', headers=auth(eve['access_token']),
+                           json={'refresh_token': bob['refresh_token']})
+    assert response.status_code == 403
+    assert client.post('/api/auth/refresh', headers=auth(bob['refresh_token'])).status_code == 200
+
+
+def test_logout_all_revokes_every_session(client, register, auth):
+    first = register('bob')['tokens']
+    second = login(client, 'bob')
+
+    response = client.post('/api/auth/logout/all', headers=auth(first['access_token']))
+    assert response.status_code == 200
+
+    for tokens in (first, second):
+        assert client.get('/api/auth/profile', headers=auth(tokens['access_token'])).status_code == 401
+        assert client.post('/api/auth/refresh', headers=auth(tokens['refresh_token'])).status_code == 401
+
+
+def test_login_right_after_revoke_all_is_valid(client, register, auth):
+    tokens = register('bob')['tokens']
+    client.post('/api/auth/logout/all', headers=auth(tokens['access_token']))
+
+    # Тот же момент времени (та же секунда iat) – новый токен действителен
+    fresh = login(client, 'bob')
+    assert client.get('/api/auth/profile', headers=auth(fresh['access_token'])).status_code == 200
+
+
+def test_admin_revokes_user_tokens(client, register, admin, auth):
+    bob = register('bob')
+    headers = auth(bob['tokens']['access_token'])
+
+    response = client.post(f"/api/auth/users/{bob['user']['id']}/revoke", headers=headers)
+    assert response.status_code == 403
+
+    response = client.post(f"/api/auth/users/{bob['user']['id']}/revoke",
+                           headers=auth(admin['tokens']['access_token']))
+    assert response.status_code == 200
+    assert client.get('/api/auth/profile', headers=headers).status_code == 401
+    # Токены администратора не затронуты
+    assert client.get('/api/auth/profile', headers=auth(admin['tokens']['access_token'])).status_code == 200
+
+
+def test_revocations_survive_restart(client, register, auth, restart):
+    bob = register('bob')['tokens']
+    eve = register('eve')['tokens']
+    client.post('/api/auth/logout', headers=auth(bob['access_token']))
+    client.post('/api/auth/logout/all', headers=auth(eve['access_token']))
+
+    # Новый процесс с той же БД загружает отзывы при старте
+    restarted = restart()
+    client = restarted.test_client()
+    assert client.get('/api/auth/profile', headers=auth(bob['access_token'])).status_code == 401
+    assert client.get('/api/auth/profile', headers=auth(eve['access_token'])).status_code == 401
+    assert client.post('/api/auth/refresh', headers=auth(eve['refresh_token'])).status_code == 401
+
+
+def test_logout_after_other_worker_revoked_same_token(app, client, register, auth):
+    tokens = register('bob')['tokens']
+    # Другой воркер уже записал отзыв, этот процесс о нём ещё не знает
+    with app.app_context():
+        payload = decode_token(tokens['access_token'])
+        db.session.add(RevokedToken(jti=payload['jti'], user_id=int(payload['sub']), token_type='access',
+                                    expires_at=datetime.utcfromtimestamp(payload['exp'])))
+        db.session.commit()
+
+    response = client.post('/api/auth/logout', headers=auth(tokens['access_token']))
+    assert response.status_code == 200
+    assert client.get('/api/auth/profile', headers=auth(tokens['access_token'])).status_code == 401
+    with app.app_context():
+        assert RevokedToken.query.filter_by(jti=payload['jti']).count() == 1
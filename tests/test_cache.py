@@ -0,0 +1,19 @@
+from app import create_app
+from utils.cache import cache
+
+
+def test_shared_cache_is_scoped_by_database(app_config, tmp_path):
+    config = {**app_config, 'CACHE_BACKEND': 'sqlite', 'CACHE_PATH': str(tmp_path / 'cache.sqlite')}
+    first = {**config, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'first.db'}"}
+    second = {**config, 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'second.db'}"}
+
+    create_app(first)
+    cache.set('categories', '', ['first'])
+
+    # Тот же файл кэша, другая БД: ни значения, ни версии не общие
+    create_app(second)
+    assert cache.get('categories', '') is None
+    cache.invalidate('categories')
+
+    create_app(first)
+    assert cache.get('categories', '') == ['first']
@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pytest
+
+from models import db, Comment, Post
+
+
+@pytest.fixture
+def headers(admin, auth):
+    return auth(admin['tokens']['access_token'])
+
+
+@pytest.fixture
+def post_id(client, headers):
+    response = client.post('/api/posts', json={'title': 'thread', 'content': 'body'}, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+@pytest.fixture
+def reply(client, headers, post_id):
+    """Создать комментарий (или ответ на parent_id), возвращает его JSON"""
+    def reply(text, parent_id=None, target=None):
+        response = client.post(f'/api/posts/{target or post_id}/comments', headers=headers,
+                               json={'text': text, 'parent_id': parent_id})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return reply
+
+
+def texts(comments):
+    return [c['text'] for c in comments]
+
+
+def test_replies_are_listed_in_tree_order(client, post_id, reply):
+    a = reply('A')
+    b = reply('B')
+    a1 = reply('A1', a['id'])
+    a1x = reply('A1x', a1['id'])
+    reply('A2', a['id'])
+    reply('B1', b['id'])
+
+    assert (a1['parent_id'], a1['depth']) == (a['id'], 1)
+    assert (a1x['parent_id'], a1x['depth']) == (a1['id'], 2)
+
+    comments = client.get(f'/api/posts/{post_id}/comments').get_json()
+    assert texts(comments) == ['A', 'A1', 'A1x', 'A2', 'B', 'B1']
+
+    subtree = client.get(f"/api/posts/{post_id}/comments?root_id={a['id']}&max_depth=1").get_json()
+    assert texts(subtree) == ['A', 'A1', 'A2']
+
+
+def test_reply_validation(app, client, headers, post_id, reply):
+    other = client.post('/api/posts', json={'title': 'other', 'content': 'x'}, headers=headers).get_json()['id']
+    foreign = reply('foreign', target=other)
+
+    response = client.post(f'/api/posts/{post_id}/comments', headers=headers,
+                           json={'text': 'x', 'parent_id': foreign['id']})
+    assert response.status_code == 400
+
+    app.config['COMMENTS_MAX_DEPTH'] = 1
+    top = reply('top')
+    child = reply('child', top['id'])
+    response = client.post(f'/api/posts/{post_id}/comments', headers=headers,
+                           json={'text': 'too deep', 'parent_id': child['id']})
+    assert response.status_code == 400
+
+
+def test_delete_removes_subtree(app, client, headers, post_id, reply):
+    a = reply('A')
+    a1 = reply('A1', a['id'])
+    reply('A1x', a1['id'])
+    reply('B')
+
+    assert client.delete(f"/api/comments/{a1['id']}", headers=headers).status_code == 200
+    assert texts(client.get(f'/api/posts/{post_id}/comments').get_json()) == ['A', 'B']
+
+    assert client.delete(f"/api/comments/{a['id']}", headers=headers).status_code == 200
+    assert texts(client.get(f'/api/posts/{post_id}/comments').get_json()) == ['B']
+    assert client.get(f'/api/posts/{post_id}').get_json()['comments_count'] == 1
+
+
+def test_threads_are_paginated_with_their_replies(client, post_id, reply):
+    roots = [reply(f'T{i}') for i in range(5)]
+    reply('T0.a', roots[0]['id'])
+    t1a = reply('T1.a', roots[1]['id'])
+    reply('T1.a.x', t1a['id'])
+    reply('T2.a', roots[2]['id'])
+
+    page = client.get(f'/api/posts/{post_id}/comments?page=1&per_page=2').get_json()
+    assert (page['total'], page['pages'], page['current_page']) == (5, 3, 1)
+    assert texts(page['comments']) == ['T0', 'T0.a', 'T1', 'T1.a', 'T1.a.x']
+
+    page = client.get(f'/api/posts/{post_id}/comments?page=2&per_page=2').get_json()
+    assert texts(page['comments']) == ['T2', 'T2.a', 'T3']
+
+    page = client.get(f'/api/posts/{post_id}/comments?page=4&per_page=2').get_json()
+    assert page['comments'] == []
+
+    # Пагинация по прямым ответам ветки
+    page = client.get(f"/api/posts/{post_id}/comments?root_id={roots[1]['id']}&page=1&per_page=1").get_json()
+    assert page['total'] == 1
+    assert texts(page['comments']) == ['T1.a', 'T1.a.x']
+
+
+def test_comments_without_path_are_filled(app, client, post_id, reply):
+    """Комментарии без path (старая БД) получают путь и принимают ответы"""
+    legacy = reply('legacy')
+    with app.app_context():
+        Comment.query.update({Comment.path: None})
+        db.session.commit()
+
+    child = reply('child', legacy['id'])
+    assert child['depth'] == 1
+    page = client.get(f'/api/posts/{post_id}/comments?page=1').get_json()
+    assert texts(page['comments']) == ['legacy', 'child']
+
+    # Остальные пути заполняет flask upgrade-schema
+    with app.app_context():
+        Comment.query.update({Comment.path: None})
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['upgrade-schema'])
+    assert result.exception is None
+    with app.app_context():
+        assert Comment.query.filter(Comment.path.is_(None)).count() == 0
+        assert db.session.get(Post, post_id).comments_count == 2
+
+
+def test_comments_do_not_touch_post_updated_at(app, client, headers, post_id, reply):
+    edited = datetime(2020, 1, 1)
+    with app.app_context():
+        Post.query.filter_by(id=post_id).update({Post.updated_at: edited})
+        db.session.commit()
+
+    comment = reply('A')
+    client.delete(f"/api/comments/{comment['id']}", headers=headers)
+    with app.app_context():
+        Post.recount_comments()
+        assert db.session.get(Post, post_id).updated_at == edited
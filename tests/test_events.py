@@ -0,0 +1,84 @@
+import pytest
+
+from utils.pubsub import EventHub, event_hub
+
+
+def ids(events):
+    return [event[0] for event in events]
+
+
+def test_resume_from_last_event_id():
+    hub = EventHub(history_size=3)
+    published = [hub.publish('a', 'created', {'n': n}) for n in range(5)]
+
+    sub, backlog, complete = hub.subscribe('a')
+    assert (backlog, complete) == ([], True)
+
+    sub, backlog, complete = hub.subscribe('a', published[1])
+    assert (ids(backlog), complete) == (published[2:], True)
+    assert backlog[0][1:] == ('created', '{"n": 2}')
+
+    # Пропущенное событие уже вытеснено из кольцевого буфера
+    sub, backlog, complete = hub.subscribe('a', published[0])
+    assert (ids(backlog), complete) == (published[2:], False)
+
+
+def test_future_event_id_requests_reset():
+    """Id больше последнего выданного – клиент пришёл из прошлого процесса"""
+    hub = EventHub()
+    last = hub.publish('a', 'created', {})
+    sub, backlog, complete = hub.subscribe('a', last + 100)
+    assert (backlog, complete) == ([], False)
+
+
+def test_dropped_channel_history_requests_reset():
+    hub = EventHub(history_channels=1)
+    first = hub.publish('a', 'created', {})
+    hub.publish('b', 'created', {})  # буфер канала 'a' удалён сверх лимита
+    assert hub.subscribe('a', first - 1)[2] is False
+
+    resumed = hub.publish('a', 'created', {})
+    sub, backlog, complete = hub.subscribe('a', resumed - 1)
+    assert (ids(backlog), complete) == ([resumed], True)
+    # Клиент отстал до удаления буфера – часть событий потеряна
+    assert hub.subscribe('a', first - 1)[2] is False
+
+
+@pytest.fixture
+def stream(client, admin, auth):
+    """Открыть SSE-поток комментариев с Last-Event-ID, возвращает генератор чанков"""
+    headers = auth(admin['tokens']['access_token'])
+    post_id = client.post('/api/posts', json={'title': 'live', 'content': 'x'}, headers=headers).get_json()['id']
+    for text in ('first', 'second'):
+        client.post(f'/api/posts/{post_id}/comments', json={'text': text}, headers=headers)
+    # Общий для тестов event_hub мог сохранить события канала с прошлой БД
+    published = ids(event_hub._history[f'post:{post_id}:comments'])[-2:]
+    responses = []
+
+    def stream(last_event_id):
+        response = client.get(f'/api/posts/{post_id}/comments/stream', buffered=False,
+                              headers={'Last-Event-ID': str(last_event_id)})
+        responses.append(response)
+        return (chunk.decode() for chunk in response.response)
+
+    yield stream, published
+    for response in responses:
+        response.close()
+    # Закрытый поток отписывается от канала
+    assert event_hub.subscribers_count() == 0
+
+
+def test_stream_resumes_after_last_event_id(stream):
+    open_stream, published = stream
+    chunks = open_stream(published[0])
+    assert next(chunks).startswith('retry:')
+    message = next(chunks)
+    assert message.startswith(f'id: {published[1]}\nevent: comment_created\n')
+    assert '"second"' in message
+
+
+def test_stream_sends_reset_for_unknown_event_id(stream):
+    open_stream, published = stream
+    chunks = open_stream(published[-1] + 100)
+    assert next(chunks).startswith('retry:')
+    assert next(chunks) == 'event: reset\ndata: {}\n\n'
@@ -0,0 +1,69 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from models import db, Post, Comment, User
+
+# Схема БД до появления денормализованных колонок, веток и post_content
+LEGACY_SCHEMA = '''
+CREATE TABLE role (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE);
+CREATE TABLE user (
+    id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(120) NOT NULL UNIQUE,
+    password_hash VARCHAR(128), created_at DATETIME DEFAULT CURRENT_TIMESTAMP, is_active BOOLEAN,
+    role_id INTEGER REFERENCES role (id)
+);
+CREATE TABLE category (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR(50) NOT NULL UNIQUE);
+CREATE TABLE post (
+    id INTEGER NOT NULL PRIMARY KEY, title VARCHAR(100) NOT NULL, content TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    category_id INTEGER REFERENCES category (id), user_id INTEGER NOT NULL REFERENCES user (id)
+);
+CREATE TABLE comment (
+    id INTEGER NOT NULL PRIMARY KEY, text TEXT NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    post_id INTEGER NOT NULL REFERENCES post (id), author_id INTEGER NOT NULL REFERENCES user (id)
+);
+INSERT INTO user (id, username, email) VALUES (1, 'OldUser', 'Old@Example.com');
+INSERT INTO post (id, title, content, updated_at, user_id) VALUES (1, 'legacy', 'legacy body', '2020-01-01 00:00:00', 1);
+INSERT INTO comment (id, text, post_id, author_id) VALUES (1, 'a', 1, 1), (2, 'b', 1, 1);
+'''
+
+
+@pytest.fixture
+def legacy_app(app_config, tmp_path):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as connection:
+        connection.executescript(LEGACY_SCHEMA)
+    return create_app({**app_config, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'}), path
+
+
+def post_columns(path):
+    with sqlite3.connect(path) as connection:
+        return {row[1] for row in connection.execute('PRAGMA table_info(post)')}
+
+
+def test_app_start_does_not_change_existing_tables(legacy_app):
+    app, path = legacy_app
+    assert 'content' in post_columns(path)
+    assert 'comments_count' not in post_columns(path)
+
+
+def test_upgrade_schema_command(legacy_app):
+    app, path = legacy_app
+    result = app.test_cli_runner().invoke(args=['upgrade-schema'])
+    assert result.exception is None
+
+    assert 'content' not in post_columns(path)
+    with app.app_context():
+        post = db.session.get(Post, 1)
+        assert post.content == 'legacy body'
+        assert post.comments_count == 2
+        assert post.updated_at == datetime(2020, 1, 1)
+        assert [c.path for c in Comment.query.order_by(Comment.id)] == ['0000000001', '0000000002']
+        assert db.session.get(User, 1).username_lower == 'olduser'
+
+    # Повторный запуск ничего не меняет
+    result = app.test_cli_runner().invoke(args=['upgrade-schema'])
+    assert result.exception is None
+    assert 'актуальна' in result.output
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.stats
+from models import db, Post, Comment, Category, DailyStat
+from utils.stats import catch_up
+
+
+def snapshot():
+    return {(row.day, row.metric, row.key): row.count for row in DailyStat.query.all()}
+
+
+@pytest.fixture
+def content(app, admin):
+    """Два поста и три комментария за два дня"""
+    today = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0)
+    yesterday = today - timedelta(days=1)
+    with app.app_context():
+        author_id = admin['user']['id']
+        category = Category(name='news')
+        db.session.add(category)
+        db.session.flush()
+        first = Post(title='first', content='a', user_id=author_id, category_id=category.id, created_at=yesterday)
+        second = Post(title='second', content='b', user_id=author_id, created_at=today)
+        db.session.add_all([first, second])
+        db.session.flush()
+        db.session.add_all([
+            Comment(text='1', post_id=first.id, author_id=author_id, created_at=yesterday),
+            Comment(text='2', post_id=first.id, author_id=author_id, created_at=today),
+            Comment(text='3', post_id=second.id, author_id=author_id, created_at=today),
+        ])
+        db.session.commit()
+        return {'author_id': author_id, 'category_id': category.id, 'today': today.date(),
+                'yesterday': yesterday.date(), 'post_id': second.id}
+
+
+def test_catch_up_counts_rows_once(app, content):
+    with app.app_context():
+        assert catch_up() == {'user': 1, 'post': 2, 'comment': 3}
+        stats = snapshot()
+
+        assert catch_up() == {'user': 0, 'post': 0, 'comment': 0}
+        assert snapshot() == stats
+
+    today, yesterday = content['today'], content['yesterday']
+    assert stats[(yesterday, 'posts', 0)] == 1
+    assert stats[(today, 'posts', 0)] == 1
+    assert stats[(yesterday, 'comments', 0)] == 1
+    assert stats[(today, 'comments', 0)] == 2
+    assert stats[(today, 'category_comments', content['category_id'])] == 1
+    assert stats[(today, 'category_comments', 0)] == 1
+    assert stats[(today, 'author_comments', content['author_id'])] == 2
+
+
+def test_catch_up_adds_only_new_rows(app, content):
+    with app.app_context():
+        catch_up()
+        before = snapshot()
+
+        db.session.add(Comment(text='4', post_id=content['post_id'], author_id=content['author_id'],
+                               created_at=datetime.combine(content['today'], datetime.min.time())))
+        db.session.commit()
+        assert catch_up()['comment'] == 1
+
+        after = snapshot()
+        changed = {key for key in after if after[key] != before.get(key)}
+        assert changed == {
+            (content['today'], 'comments', 0),
+            (content['today'], 'category_comments', 0),
+            (content['today'], 'author_comments', content['author_id']),
+        }
+        assert all(after[key] == before[key] + 1 for key in changed)
+
+
+def test_catch_up_in_batches_matches_single_pass(app, content, monkeypatch):
+    monkeypatch.setattr(utils.stats, 'BATCH_SIZE', 1)
+    with app.app_context():
+        assert catch_up() == {'user': 1, 'post': 2, 'comment': 3}
+        assert sum(count for (_, metric, _), count in snapshot().items() if metric == 'comments') == \
+            Comment.query.count()
+
+
+def test_catch_up_stops_after_max_batches(app, content, monkeypatch):
+    monkeypatch.setattr(utils.stats, 'BATCH_SIZE', 1)
+    with app.app_context():
+        assert catch_up(max_batches=2) == {'user': 1, 'post': 2, 'comment': 2}
+        assert catch_up(max_batches=2) == {'user': 0, 'post': 0, 'comment': 1}
+
+
+def test_stats_request_limits_catch_up(client, app, admin, content, auth, monkeypatch):
+    """Запрос догоняет только STATS_REQUEST_BATCHES пачек, остальное – flask stats-catch-up"""
+    monkeypatch.setattr(utils.stats, 'BATCH_SIZE', 1)
+    app.config['STATS_REQUEST_BATCHES'] = 1
+    data = client.get('/api/stats?days=2', headers=auth(admin['tokens']['access_token'])).get_json()
+    assert sum(day['comments'] for day in data['daily']) == 1
+
+    result = app.test_cli_runner().invoke(args=['stats-catch-up'])
+    assert result.exception is None
+    data = client.get('/api/stats?days=2', headers=auth(admin['tokens']['access_token'])).get_json()
+    assert [day['comments'] for day in data['daily']] == [1, 2]
+
+
+def test_catch_up_skips_batch_when_watermark_moved(app, content, monkeypatch):
+    """Если водяной знак сдвинул другой воркер, пачка не учитывается повторно"""
+    with app.app_context():
+        real_execute = db.session.execute
+
+        def execute(statement, *args, **kwargs):
+            # Эмуляция параллельного воркера: он успел обработать строки раньше нас
+            if getattr(statement, 'is_update', False) and statement.table.name == 'stats_watermark':
+                real_execute(db.text("UPDATE stats_watermark SET last_id = last_id + 100"))
+            return real_execute(statement, *args, **kwargs)
+
+        monkeypatch.setattr(db.session, 'execute', execute)
+        assert catch_up()['comment'] == 0
+        monkeypatch.undo()
+        assert DailyStat.query.count() == 0
+
+
+def test_stats_endpoint(client, register, admin, content, auth):
+    response = client.get('/api/stats?days=2', headers=auth(admin['tokens']['access_token']))
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [day['comments'] for day in data['daily']] == [1, 2]
+    assert data['top_authors'][0]['posts'] == 2
+
+    # Повторный запрос не удваивает агрегаты
+    again = client.get('/api/stats?days=2', headers=auth(admin['tokens']['access_token'])).get_json()
+    assert again == data
+
+    user = register('bob')
+    response = client.get('/api/stats', headers=auth(user['tokens']['access_token']))
+    assert response.status_code == 403
@@ -0,0 +1,71 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, Post, Comment
+from utils.trending import TrendingIndex
+
+
+@pytest.fixture
+def index(app):
+    index = TrendingIndex()
+    index.app = app
+    return index
+
+
+def test_first_top_rebuilds_once(app, index, monkeypatch):
+    """Запрос, дождавшийся блокировки, не повторяет уже сделанную перестройку"""
+    queries = []
+    real_query = db.session.query
+    monkeypatch.setattr(db.session, 'query', lambda *args: queries.append(args) or real_query(*args))
+    monkeypatch.setattr(index, '_ensure_worker', lambda: None)
+
+    def top():
+        with app.app_context():
+            index.top()
+
+    with index._rebuild_lock:
+        waiting = threading.Thread(target=top)
+        waiting.start()
+        time.sleep(0.1)
+        # Пока поток ждёт блокировку, рейтинг построил другой запрос
+        index._built_at = time.monotonic()
+    waiting.join()
+    assert queries == []
+
+
+def test_changes_during_rebuild_are_replayed(app, admin, index, monkeypatch):
+    """Изменения, пришедшие во время чтения из БД, применяются к новому рейтингу ровно один раз"""
+    created_at = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        posts = [Post(title=name, content='x', user_id=admin['user']['id']) for name in 'ABCD']
+        db.session.add_all(posts)
+        db.session.flush()
+        a, b, c, d = (post.id for post in posts)
+        comments = [Comment(text='x', post_id=post_id, author_id=admin['user']['id'], created_at=created_at)
+                    for post_id in (a, a, c, d)]
+        db.session.add_all(comments)
+        db.session.commit()
+        x, _, z, _ = (comment.id for comment in comments)
+
+    real_query = db.session.query
+
+    def query(*args):
+        # Пока перестройка читает БД, в других запросах:
+        index.add_comment(a, x, created_at)             # уже в выборке – второй раз не учитывается
+        index.add_comment(b, 1000, created_at)          # закоммичен после чтения – добавляется
+        index.remove_comment(c, z, created_at)          # удалён после чтения – вычитается
+        index.remove_comment(a, 1001, created_at)       # удалён до чтения – вклада нет
+        index.discard(d)
+        return real_query(*args)
+
+    with app.app_context():
+        monkeypatch.setattr(db.session, 'query', query)
+        index.rebuild()
+
+    scores = dict(index._scores)
+    assert set(scores) == {a, b}
+    assert scores[a] == pytest.approx(2 * scores[b])
+    assert index._journal is None
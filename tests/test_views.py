@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from models import db, Post
+from utils.views import view_counter
+
+
+@pytest.fixture
+def post_id(client, admin, auth):
+    response = client.post('/api/posts', json={'title': 'viewed', 'content': 'body'},
+                           headers=auth(admin['tokens']['access_token']))
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_flush_does_not_touch_updated_at(app, client, post_id):
+    edited = datetime(2020, 1, 1)
+    with app.app_context():
+        Post.query.filter_by(id=post_id).update({Post.updated_at: edited})
+        db.session.commit()
+
+    assert client.get(f'/api/posts/{post_id}').status_code == 200
+    view_counter.flush()
+
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        assert post.views == 1
+        assert post.updated_at == edited
+
+
+def views_in_db(app, post_id):
+    with app.app_context():
+        return db.session.get(Post, post_id).views
+
+
+def test_views_are_counted_once(app, client, post_id, monkeypatch):
+    """Ответ показывает записанные просмотры плюс ещё не записанные – без двойного учёта"""
+    monkeypatch.setattr(view_counter, 'flush_events', 1000)
+    assert [client.get(f'/api/posts/{post_id}').get_json()['views'] for _ in range(3)] == [1, 2, 3]
+
+    view_counter.flush()
+    assert views_in_db(app, post_id) == 3
+    assert view_counter.pending(post_id) == 0
+    assert client.get(f'/api/posts/{post_id}').get_json()['views'] == 4
+
+    # Неудачная запись возвращает приращения в память
+    def fail(*args, **kwargs):
+        raise RuntimeError('db is down')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'execute', fail)
+        with pytest.raises(RuntimeError):
+            view_counter.flush()
+    assert view_counter.pending(post_id) == 1
+    assert client.get(f'/api/posts/{post_id}').get_json()['views'] == 5
+
+    view_counter.flush()
+    assert views_in_db(app, post_id) == 5
+
+
+def test_flush_after_flush_events(app, client, post_id, monkeypatch):
+    monkeypatch.setattr(view_counter, 'flush_events', 3)
+    for _ in range(3):
+        client.get(f'/api/posts/{post_id}')
+
+    # Запись делает фоновый поток, не дожидаясь VIEWS_FLUSH_SECONDS
+    deadline = time.monotonic() + 2
+    while views_in_db(app, post_id) != 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert views_in_db(app, post_id) == 3
+    assert view_counter.pending(post_id) == 0
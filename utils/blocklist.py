@@ -0,0 +1,170 @@
+"""
+Отзыв JWT-токенов (logout).
+
+Проверка токена идёт только по памяти процесса:
+- отзыв «всех токенов пользователя» увеличивает User.token_version; в памяти –
+  словарь user_id -> минимальная действующая версия, токены с claim "ver"
+  меньше неё недействительны (без неоднозначности токенов той же секунды);
+- отзыв отдельного токена – фильтр Блума как быстрый отрицательный ответ
+  и словарь jti -> exp для точной проверки.
+Записи живут до истечения срока самого токена. Все отзывы сохраняются в
+таблицу RevokedToken: при старте процесс загружает их, а раз в
+BLOCKLIST_SYNC_SECONDS подтягивает новые строки, записанные другими воркерами.
+"""
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+
+def to_timestamp(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+class BloomFilter:
+    def __init__(self, size_bits=1 << 20, hashes=4):
+        self.size = size_bits
+        self.hashes = hashes
+        self.bits = bytearray(size_bits // 8 + 1)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[4 * i:4 * i + 4], 'little') % self.size
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class TokenBlocklist:
+    def __init__(self, bloom_size=1 << 20, sync_seconds=5):
+        self.bloom_size = bloom_size
+        self.sync_seconds = sync_seconds
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._bloom = BloomFilter(bloom_size)
+        self._jtis = {}          # jti -> exp (unix time)
+        self._user_versions = {}  # user_id -> (минимальная действующая версия, exp записи)
+        self._last_row_id = 0
+        self._synced_at = 0.0
+
+    def init_app(self, app):
+        self.bloom_size = app.config.get('BLOCKLIST_BLOOM_SIZE', 1 << 20)
+        self.sync_seconds = app.config.get('BLOCKLIST_SYNC_SECONDS', 5)
+        # Состояние относится к БД приложения – заполняется заново через load()
+        self._bloom = BloomFilter(self.bloom_size)
+        self._jtis = {}
+        self._user_versions = {}
+        self._last_row_id = 0
+        self._synced_at = 0.0
+        app.extensions['token_blocklist'] = self
+
+    # ---------- Память ----------
+
+    def _remember(self, row):
+        if row.jti:
+            self._bloom.add(row.jti)
+            self._jtis[row.jti] = to_timestamp(row.expires_at)
+        elif row.token_version is not None:
+            current = self._user_versions.get(row.user_id)
+            if current is None or current[0] < row.token_version:
+                self._user_versions[row.user_id] = (row.token_version, to_timestamp(row.expires_at))
+        self._last_row_id = max(self._last_row_id, row.id)
+
+    def _purge(self, now):
+        """Удаление истёкших записей и перестройка фильтра Блума"""
+        self._jtis = {jti: exp for jti, exp in self._jtis.items() if exp > now}
+        self._user_versions = {uid: v for uid, v in self._user_versions.items() if v[1] > now}
+        self._bloom = BloomFilter(self.bloom_size)
+        for jti in self._jtis:
+            self._bloom.add(jti)
+
+    def load(self):
+        """Загрузка действующих отзывов из БД (при старте), истёкшие строки удаляются"""
+        from models import db, RevokedToken
+
+        RevokedToken.query.filter(RevokedToken.expires_at < datetime.utcnow()).delete()
+        db.session.commit()
+        with self._lock:
+            for row in RevokedToken.query.order_by(RevokedToken.id).all():
+                self._remember(row)
+            self._synced_at = time.monotonic()
+
+    def sync(self):
+        """Подтянуть отзывы, записанные другими процессами"""
+        from models import RevokedToken
+
+        rows = RevokedToken.query.filter(RevokedToken.id > self._last_row_id) \
+            .order_by(RevokedToken.id).all()
+        with self._lock:
+            for row in rows:
+                self._remember(row)
+            self._synced_at = time.monotonic()
+            if len(self._jtis) > self.bloom_size // 16:
+                self._purge(time.time())
+
+    # ---------- Проверка ----------
+
+    def is_revoked(self, payload):
+        if time.monotonic() - self._synced_at >= self.sync_seconds and self._sync_lock.acquire(blocking=False):
+            # Синхронизируется один запрос, остальные проверяют по текущим данным
+            try:
+                self.sync()
+            finally:
+                self._sync_lock.release()
+
+        version = self._user_versions.get(int(payload['sub']))
+        if version is not None and payload.get('ver', 0) < version[0]:
+            return True
+
+        jti = payload.get('jti')
+        if jti is None or jti not in self._bloom:
+            return False
+        return jti in self._jtis
+
+    # ---------- Отзыв ----------
+
+    def revoke(self, payload):
+        """Отзыв одного токена по его payload"""
+        from models import db, RevokedToken
+
+        if payload['jti'] in self._jtis:
+            return
+        # Тот же токен мог только что отозвать другой воркер: его строка нас устраивает
+        db.session.execute(sqlite_insert(RevokedToken).values(
+            jti=payload['jti'],
+            user_id=int(payload['sub']),
+            token_type=payload.get('type'),
+            revoked_at=datetime.utcnow(),
+            expires_at=datetime.utcfromtimestamp(payload['exp'])
+        ).on_conflict_do_nothing(index_elements=['jti']))
+        db.session.commit()
+        row = RevokedToken.query.filter_by(jti=payload['jti']).one()
+        with self._lock:
+            self._remember(row)
+
+    def revoke_all(self, user_id, expires_in):
+        """
+        Отзыв всех выданных пользователю токенов.
+        expires_in – максимальное время жизни токена (после него запись не нужна)
+        """
+        from models import db, User, RevokedToken
+
+        User.query.filter_by(id=user_id).update({User.token_version: User.token_version + 1})
+        version = db.session.query(User.token_version).filter_by(id=user_id).scalar()
+        now = datetime.utcnow()
+        row = RevokedToken(user_id=user_id, token_version=version, revoked_at=now, expires_at=now + expires_in)
+        db.session.add(row)
+        db.session.commit()
+        with self._lock:
+            self._remember(row)
+
+
+blocklist = TokenBlocklist()
@@ -0,0 +1,229 @@
+"""
+Кэш для маршрутов из routes/.
+
+Бэкенды:
+- memory – LRU в памяти процесса (один воркер / разработка);
+- sqlite – общий для всех воркеров на хосте файл SQLite в режиме WAL.
+
+Ключи версионируются по пространствам имён: полный ключ –
+"<БД>:<namespace>:<версия>:<ключ>", где <БД> – хэш SQLALCHEMY_DATABASE_URI,
+чтобы приложения с разными БД не читали записи друг друга из общего файла.
+Инвалидация увеличивает версию пространства в бэкенде, и старые записи
+просто перестают читаться. Для общего бэкенда
+значения дополнительно кэшируются в локальном LRU процесса: запись с
+версионированным ключом никогда не меняется, поэтому при чтении достаточно
+одного обращения к общему хранилищу – за текущей версией.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUBackend:
+    shared = False
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (value, expires_at)
+        self._versions = {}
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class SQLiteBackend:
+    shared = True
+
+    # Раз в столько записей удаляются истёкшие строки
+    PURGE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache '
+                     '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_version '
+                     '(namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+
+    def _conn(self):
+        # Отдельное соединение на поток и на процесс (после fork соединение не переиспользуется)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute('SELECT value, expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        conn = self._conn()
+        conn.execute('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                     (key, json.dumps(value), time.time() + ttl if ttl else None))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute('DELETE FROM cache WHERE expires_at < ?', (time.time(),))
+
+    def version(self, namespace):
+        row = self._conn().execute('SELECT version FROM cache_version WHERE namespace = ?',
+                                   (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace):
+        self._conn().execute('INSERT INTO cache_version (namespace, version) VALUES (?, 1) '
+                             'ON CONFLICT(namespace) DO UPDATE SET version = version + 1', (namespace,))
+
+
+class Cache:
+    def __init__(self):
+        self.backend = None
+        self.local = None
+        self.default_ttl = 300
+        self.prefix = ''
+        self._lock = threading.Lock()
+        self._stats = {}  # namespace -> [hits, misses]
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'sqlite')
+        lru_size = app.config.get('CACHE_LRU_SIZE', 1024)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        # Файл кэша может быть общим для приложений с разными БД
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+        self.prefix = hashlib.sha1(uri.encode()).hexdigest()[:12]
+
+        if backend == 'sqlite':
+            path = app.config.get('CACHE_PATH')
+            if not path:
+                os.makedirs(app.instance_path, exist_ok=True)
+                path = os.path.join(app.instance_path, 'cache.sqlite')
+            self.backend = SQLiteBackend(path)
+            self.local = LRUBackend(lru_size)
+        elif backend == 'memory':
+            self.backend = LRUBackend(lru_size)
+            self.local = None
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
+        app.extensions['cache'] = self
+
+    def _count(self, namespace, hit):
+        with self._lock:
+            counters = self._stats.setdefault(namespace, [0, 0])
+            counters[0 if hit else 1] += 1
+
+    def _scoped(self, namespace):
+        return f'{self.prefix}:{namespace}'
+
+    def _key(self, namespace, key):
+        scoped = self._scoped(namespace)
+        return f'{scoped}:{self.backend.version(scoped)}:{key}'
+
+    def _get(self, namespace, full_key):
+        value = self.local.get(full_key) if self.local is not None else None
+        if value is None:
+            value = self.backend.get(full_key)
+            if value is not None and self.local is not None:
+                self.local.set(full_key, value, self.default_ttl)
+        self._count(namespace, value is not None)
+        return value
+
+    def _set(self, full_key, value, ttl=None):
+        ttl = ttl or self.default_ttl
+        self.backend.set(full_key, value, ttl)
+        if self.local is not None:
+            self.local.set(full_key, value, ttl)
+
+    def get(self, namespace, key):
+        """Значение или None"""
+        return self._get(namespace, self._key(namespace, key))
+
+    def set(self, namespace, key, value, ttl=None):
+        self._set(self._key(namespace, key), value, ttl)
+
+    def get_or_set(self, namespace, key, factory, ttl=None):
+        # Версия читается до вычисления: если во время factory() случится
+        # инвалидация, результат уйдёт под старую версию и не будет прочитан
+        full_key = self._key(namespace, key)
+        value = self._get(namespace, full_key)
+        if value is None:
+            value = factory()
+            self._set(full_key, value, ttl)
+        return value
+
+    def _lookup(self, namespace, key):
+        full_key = self._key(namespace, key)
+        return full_key, self._get(namespace, full_key)
+
+    async def _offload(self, func, *args):
+        # Общий бэкенд – синхронный sqlite3: в цикле событий он блокировал бы все соединения
+        if self.backend.shared:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def aget_or_set(self, namespace, key, factory, ttl=None):
+        """get_or_set для асинхронной factory (asgi.py)"""
+        full_key, value = await self._offload(self._lookup, namespace, key)
+        if value is None:
+            value = await factory()
+            await self._offload(self._set, full_key, value, ttl)
+        return value
+
+    def invalidate(self, *namespaces):
+        """Сбросить пространства имён (во всех воркерах сразу для общего бэкенда)"""
+        for namespace in namespaces:
+            self.backend.bump(self._scoped(namespace))
+
+    def stats(self):
+        """Статистика попаданий текущего процесса"""
+        with self._lock:
+            namespaces = {
+                ns: {'hits': h, 'misses': m, 'hit_rate': round(h / (h + m), 4) if h + m else None}
+                for ns, (h, m) in self._stats.items()
+            }
+        hits = sum(ns['hits'] for ns in namespaces.values())
+        misses = sum(ns['misses'] for ns in namespaces.values())
+        return {
+            'backend': type(self.backend).__name__,
+            'pid': os.getpid(),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+            'namespaces': namespaces
+        }
+
+
+cache = Cache()
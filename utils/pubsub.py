@@ -0,0 +1,172 @@
+"""
+Внутрипроцессная шина событий (publish/subscribe) для SSE-потоков.
+
+Событие сериализуется один раз при публикации и раскладывается по
+очередям подписчиков канала – без обращений к БД. Очереди ограничены:
+подписчик, который не успевает читать, отключается и переподключается
+с Last-Event-ID. Для возобновления каждый канал хранит кольцевой буфер
+последних событий; буферы держатся не более чем для EVENTS_HISTORY_CHANNELS
+каналов – давно не обновлявшиеся каналы без подписчиков вытесняются.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import threading
+from collections import OrderedDict, deque
+
+
+class Subscription:
+    def __init__(self, hub, channel, maxsize):
+        self.hub = hub
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        """Вызывается из publish(); при переполнении бросает queue.Full"""
+        self.queue.put_nowait(event)
+
+    def get(self, timeout):
+        """Следующее событие (id, name, data) или None по таймауту"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class AsyncSubscription(Subscription):
+    """
+    Подписка для asyncio (asgi.py). publish() вызывается из потоков WSGI,
+    поэтому событие передаётся в цикл событий через call_soon_threadsafe
+    """
+
+    def __init__(self, hub, channel, maxsize, loop):
+        super().__init__(hub, channel, maxsize)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def get(self, timeout):
+        raise TypeError('use "await subscription.queue.get()" for async subscriptions')
+
+
+class EventHub:
+    def __init__(self, queue_size=256, history_size=500, history_channels=1000):
+        self.queue_size = queue_size
+        self.history_size = history_size
+        self.history_channels = history_channels
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._subscribers = {}         # channel -> set(Subscription)
+        self._history = OrderedDict()  # channel -> deque((id, name, data)), от давно не обновлявшихся
+        self._evicted = {}             # channel -> id последнего вытесненного из буфера события
+        self._started = {}             # channel -> id первого события текущего буфера
+        self._dropped_upto = 0         # id последнего события среди удалённых буферов
+
+    def init_app(self, app):
+        self.queue_size = app.config.get('EVENTS_QUEUE_SIZE', 256)
+        self.history_size = app.config.get('EVENTS_HISTORY_SIZE', 500)
+        self.history_channels = app.config.get('EVENTS_HISTORY_CHANNELS', 1000)
+        app.extensions['event_hub'] = self
+
+    def _trim_history(self):
+        """Удаление буферов самых давних каналов без подписчиков сверх лимита"""
+        excess = len(self._history) - self.history_channels
+        if excess <= 0:
+            return
+        victims = []
+        for channel in self._history:
+            if channel not in self._subscribers:
+                victims.append(channel)
+                if len(victims) == excess:
+                    break
+        for channel in victims:
+            history = self._history.pop(channel)
+            self._dropped_upto = max(self._dropped_upto, history[-1][0])
+            self._evicted.pop(channel, None)
+            self._started.pop(channel, None)
+
+    def publish(self, channel, name, payload):
+        """Опубликовать событие всем подписчикам канала, возвращает id события"""
+        data = json.dumps(payload, ensure_ascii=False)
+        with self._lock:
+            event = (next(self._ids), name, data)
+            self._last_id = event[0]
+            history = self._history.get(channel)
+            if history is None:
+                history = self._history[channel] = deque(maxlen=self.history_size)
+                self._started[channel] = event[0]
+            else:
+                self._history.move_to_end(channel)
+            if len(history) == history.maxlen:
+                self._evicted[channel] = history[0][0]
+            history.append(event)
+            self._trim_history()
+            subscribers = list(self._subscribers.get(channel, ()))
+
+        for sub in subscribers:
+            if sub.overflowed:
+                continue
+            try:
+                sub.deliver(event)
+            except queue.Full:
+                # Медленный клиент: отключаем, он возобновит поток по Last-Event-ID
+                sub.overflowed = True
+        return event[0]
+
+    def subscribe(self, channel, last_event_id=None, loop=None):
+        """
+        Подписка на канал.
+        Возвращает tuple: (subscription, backlog, complete), где backlog – пропущенные
+        события после last_event_id, а complete=False, если часть из них уже вытеснена
+        из буфера и клиенту нужно перечитать данные целиком.
+        С loop возвращается AsyncSubscription для этого цикла событий
+        """
+        if loop is not None:
+            sub = AsyncSubscription(self, channel, self.queue_size, loop)
+        else:
+            sub = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(sub)
+            if last_event_id is None:
+                return sub, [], True
+            backlog = [event for event in self._history.get(channel, ()) if event[0] > last_event_id]
+            # Id из будущего означает перезапуск процесса – буфер начат заново
+            complete = self._evicted.get(channel, 0) <= last_event_id <= self._last_id
+            # События из удалённого буфера канала старше начала текущего; канал
+            # мог быть среди удалённых, если клиент отстал дальше _dropped_upto
+            started = self._started.get(channel)
+            if last_event_id < self._dropped_upto and (started is None or last_event_id < started - 1):
+                complete = False
+        return sub, backlog, complete
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subscribers = self._subscribers.get(sub.channel)
+            if subscribers is not None:
+                subscribers.discard(sub)
+                if not subscribers:
+                    del self._subscribers[sub.channel]
+
+    def subscribers_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+event_hub = EventHub()
@@ -0,0 +1,111 @@
+"""
+Доведение схемы уже существующей БД до текущих моделей.
+
+db.create_all() создаёт только отсутствующие таблицы, а колонки, добавленные
+в модели позже (comments_count, views, username_lower/email_lower,
+parent_id/path/depth у комментариев), в старой БД не появляются.
+Команда flask upgrade-schema (upgrade_schema()) запускается явно, один раз
+после обновления кода и до старта воркеров:
+- добавляет недостающие колонки (ALTER TABLE ... ADD COLUMN) и индексы;
+- переносит текст постов из старой колонки post.content (NOT NULL) в таблицу
+  post_content и удаляет колонку (нужен SQLite >= 3.35);
+- заполняет данные добавленных колонок: счётчики комментариев, поисковый
+  индекс пользователей, пути комментариев (и любые оставшиеся пустыми).
+Повторный запуск ничего не меняет. Удаление post.content необратимо –
+перед запуском сделайте резервную копию БД. Само приложение при старте
+только проверяет схему (schema_is_outdated) и ничего не меняет.
+
+Флаг AUTOINCREMENT у старых таблиц так не добавить: для них после удаления
+последней строки её id может быть выдан повторно.
+"""
+import sqlite3
+
+from sqlalchemy import inspect, text
+
+from models import db, Post, PostContent, User, UserSearchGram, UserSearchGramCount, Comment
+
+
+def missing_columns(connection):
+    """Колонки моделей, которых нет в уже существующих таблицах: [(table, column)]"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        missing += [(table, column) for column in table.columns if column.name not in columns]
+    return missing
+
+
+def has_legacy_post_content(connection):
+    return 'content' in {column['name'] for column in inspect(connection).get_columns('post')}
+
+
+def schema_is_outdated():
+    """Нужен ли flask upgrade-schema (только чтение схемы)"""
+    with db.engine.connect() as connection:
+        return bool(missing_columns(connection)) or has_legacy_post_content(connection)
+
+
+def add_missing_columns(connection):
+    """Добавляет отсутствующие колонки и индексы, возвращает set('table.column')"""
+    compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    preparer = connection.dialect.identifier_preparer
+
+    added = set()
+    for table, column in missing_columns(connection):
+        # Спецификация колонки с типом, DEFAULT и NOT NULL – как в CREATE TABLE
+        connection.execute(text(
+            f'ALTER TABLE {preparer.format_table(table)} '
+            f'ADD COLUMN {compiler.get_column_specification(column)}'
+        ))
+        added.add(f'{table.name}.{column.name}')
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    return added
+
+
+def move_post_content(connection):
+    """Перенос текстов из старой колонки post.content в post_content"""
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        raise RuntimeError(f'SQLite {sqlite3.sqlite_version} cannot drop post.content, 3.35+ required')
+
+    rows = connection.execute(text(
+        'SELECT id, content FROM post WHERE id NOT IN (SELECT post_id FROM post_content)'
+    )).all()
+    values = []
+    for post_id, content in rows:
+        body = PostContent()
+        body.text = content
+        values.append({'post_id': post_id, 'data': body.data, 'compressed': body.compressed})
+    if values:
+        connection.execute(PostContent.__table__.insert(), values)
+    connection.execute(text('ALTER TABLE post DROP COLUMN content'))
+    return len(values)
+
+
+def upgrade_schema():
+    """
+    Привести существующую БД к текущим моделям (flask upgrade-schema)
+    Возвращает set добавленных колонок
+    """
+    db.create_all()
+    with db.engine.begin() as connection:
+        added = add_missing_columns(connection)
+        if has_legacy_post_content(connection):
+            move_post_content(connection)
+
+    if 'post.comments_count' in added:
+        Post.recount_comments()
+    if 'user.username_lower' in added:
+        User.rebuild_search_index()
+    elif UserSearchGramCount.query.first() is None and UserSearchGram.query.first() is not None:
+        # Триграммы есть, счётчиков ещё нет
+        UserSearchGramCount.recount()
+        db.session.commit()
+    # Без пути комментарий не попадёт в ветки и не может получить ответ
+    if db.session.query(Comment.id).filter(Comment.path.is_(None)).first() is not None:
+        Comment.backfill_paths()
+    return added
@@ -0,0 +1,106 @@
+"""
+Инкрементальное заполнение дневных агрегатов (DailyStat).
+
+Догоняющая задача читает только строки с id больше водяного знака
+(StatsWatermark) для каждой исходной таблицы, агрегирует их по дням и
+прибавляет к DailyStat. Водяной знак сдвигается в той же транзакции с
+проверкой старого значения, поэтому параллельный запуск в другом воркере
+не посчитает строки дважды.
+
+Основную работу делает flask stats-catch-up (по cron). Запрос /api/stats
+догоняет не больше STATS_REQUEST_BATCHES пачек на таблицу, чтобы после
+большого импорта или долгого простоя не читать весь бэклог в запросе.
+"""
+from collections import Counter
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, User, Post, Comment, DailyStat, StatsWatermark
+
+BATCH_SIZE = 5000
+
+
+def user_rows(last_id):
+    return db.select(User.id, User.created_at).filter(User.id > last_id).order_by(User.id)
+
+
+def post_rows(last_id):
+    return db.select(Post.id, Post.created_at, Post.category_id, Post.user_id) \
+        .filter(Post.id > last_id).order_by(Post.id)
+
+
+def comment_rows(last_id):
+    return db.select(Comment.id, Comment.created_at, Post.category_id, Comment.author_id) \
+        .join(Post, Post.id == Comment.post_id).filter(Comment.id > last_id).order_by(Comment.id)
+
+
+# source -> (запрос новых строк, метрики строки: [(metric, key), ...])
+SOURCES = {
+    'user': (user_rows, lambda row: [('users', 0)]),
+    'post': (post_rows, lambda row: [
+        ('posts', 0), ('category_posts', row.category_id or 0), ('author_posts', row.user_id)
+    ]),
+    'comment': (comment_rows, lambda row: [
+        ('comments', 0), ('category_comments', row.category_id or 0), ('author_comments', row.author_id)
+    ]),
+}
+
+
+def catch_up_source(source, max_batches=None):
+    """
+    Учесть новые строки одной таблицы, возвращает количество обработанных строк
+    max_batches – не больше стольких пачек по BATCH_SIZE (None – до конца)
+    """
+    rows_query, metrics = SOURCES[source]
+
+    watermark = db.session.get(StatsWatermark, source)
+    if watermark is None:
+        db.session.execute(sqlite_insert(StatsWatermark).values(source=source, last_id=0)
+                           .on_conflict_do_nothing())
+        db.session.commit()
+        watermark = db.session.get(StatsWatermark, source)
+
+    processed = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        last_id = watermark.last_id
+        rows = db.session.execute(rows_query(last_id).limit(BATCH_SIZE)).all()
+        if not rows:
+            break
+
+        counts = Counter()
+        for row in rows:
+            day = row.created_at.date()
+            for metric, key in metrics(row):
+                counts[(day, metric, key)] += 1
+
+        insert = sqlite_insert(DailyStat).values([
+            {'day': day, 'metric': metric, 'key': key, 'count': count}
+            for (day, metric, key), count in counts.items()
+        ])
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=['day', 'metric', 'key'],
+            set_={'count': DailyStat.count + insert.excluded.count}
+        ))
+
+        # Сдвиг водяного знака только если его никто не сдвинул раньше нас
+        moved = db.session.execute(
+            db.update(StatsWatermark)
+            .where(StatsWatermark.source == source, StatsWatermark.last_id == last_id)
+            .values(last_id=rows[-1].id)
+        ).rowcount
+        if moved != 1:
+            db.session.rollback()
+            break
+        db.session.commit()
+        processed += len(rows)
+        batches += 1
+
+        if len(rows) < BATCH_SIZE:
+            break
+    return processed
+
+
+def catch_up(max_batches=None):
+    """Учесть новые строки всех исходных таблиц"""
+    return {source: catch_up_source(source, max_batches) for source in SOURCES}
@@ -0,0 +1,167 @@
+"""
+Рейтинг «трендовых» постов по активности комментариев.
+
+Вес комментария затухает экспоненциально: w = 2 ** ((t - epoch) / half_life).
+Благодаря фиксированной опорной точке (epoch) вес уже учтённого комментария
+не меняется со временем, поэтому рейтинг можно обновлять инкрементально
+(добавление / удаление комментария) без пересчёта всех очков.
+Раз в TRENDING_REFRESH_SECONDS фоновый поток перестраивает рейтинг из БД,
+чтобы выбросить комментарии, вышедшие за окно TRENDING_WINDOW_HOURS.
+Изменения, пришедшие во время перестройки, записываются в журнал и
+применяются к новому рейтингу поверх прочитанных из БД строк.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+
+class TrendingIndex:
+    def __init__(self, half_life_hours=24, window_hours=24 * 7, refresh_seconds=300):
+        self.half_life = half_life_hours * 3600.0
+        self.window = timedelta(hours=window_hours)
+        self.refresh_seconds = refresh_seconds
+
+        self._lock = threading.Lock()
+        self._scores = {}      # post_id -> очко
+        self._ranking = []     # отсортированный список (-очко, post_id)
+        self._epoch = datetime.utcnow()
+        self._built_at = None  # time.monotonic() последней перестройки
+        self._journal = None   # изменения во время перестройки: (op, post_id, comment_id, created_at)
+        self._rebuild_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.app = None
+
+    def init_app(self, app):
+        self.half_life = app.config.get('TRENDING_HALF_LIFE_HOURS', 24) * 3600.0
+        self.window = timedelta(hours=app.config.get('TRENDING_WINDOW_HOURS', 24 * 7))
+        self.refresh_seconds = app.config.get('TRENDING_REFRESH_SECONDS', 300)
+        self.app = app
+        app.extensions['trending'] = self
+
+    def _weight(self, created_at):
+        return 2.0 ** ((created_at - self._epoch).total_seconds() / self.half_life)
+
+    def _set_score(self, post_id, score):
+        old = self._scores.get(post_id)
+        if old is not None:
+            i = bisect_left(self._ranking, (-old, post_id))
+            if i < len(self._ranking) and self._ranking[i] == (-old, post_id):
+                del self._ranking[i]
+        # Накопленная погрешность float после вычитаний – считаем пост выбывшим
+        if score <= 1e-9:
+            self._scores.pop(post_id, None)
+            return
+        self._scores[post_id] = score
+        insort(self._ranking, (-score, post_id))
+
+    def add_comment(self, post_id, comment_id, created_at):
+        """Учесть новый комментарий"""
+        if created_at is None or created_at < datetime.utcnow() - self.window:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('add', post_id, comment_id, created_at))
+            self._set_score(post_id, self._scores.get(post_id, 0.0) + self._weight(created_at))
+
+    def remove_comment(self, post_id, comment_id, created_at):
+        """Убрать вклад удалённого комментария"""
+        if created_at is None:
+            return
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('remove', post_id, comment_id, created_at))
+            if post_id in self._scores and created_at >= self._epoch - self.window:
+                self._set_score(post_id, self._scores[post_id] - self._weight(created_at))
+
+    def discard(self, post_id):
+        """Убрать пост из рейтинга (например, при удалении поста)"""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(('discard', post_id, None, None))
+            self._set_score(post_id, 0.0)
+
+    def rebuild(self, force=True):
+        """
+        Полная перестройка рейтинга по комментариям в пределах окна
+        force=False – только если рейтинг ещё ни разу не построен
+        """
+        from models import db, Comment
+
+        with self._rebuild_lock:
+            # Пока ждали блокировку, рейтинг мог построить другой запрос
+            if not force and self._built_at is not None:
+                return
+            with self._lock:
+                self._journal = []
+            try:
+                now = datetime.utcnow()
+                rows = db.session.query(Comment.id, Comment.post_id, Comment.created_at) \
+                    .filter(Comment.created_at >= now - self.window).all()
+            except Exception:
+                with self._lock:
+                    self._journal = None
+                raise
+
+            def weight(created_at):
+                return 2.0 ** ((created_at - now).total_seconds() / self.half_life)
+
+            scores = {}
+            counted = set()
+            for comment_id, post_id, created_at in rows:
+                scores[post_id] = scores.get(post_id, 0.0) + weight(created_at)
+                counted.add(comment_id)
+
+            with self._lock:
+                # Журнал: комментарий, уже попавший в выборку, второй раз не учитывается,
+                # а удалённый учитывается, только если его вклад есть в новых очках
+                for op, post_id, comment_id, created_at in self._journal:
+                    if op == 'add' and comment_id not in counted:
+                        scores[post_id] = scores.get(post_id, 0.0) + weight(created_at)
+                        counted.add(comment_id)
+                    elif op == 'remove' and comment_id in counted:
+                        scores[post_id] = scores.get(post_id, 0.0) - weight(created_at)
+                        counted.discard(comment_id)
+                    elif op == 'discard':
+                        scores.pop(post_id, None)
+                self._journal = None
+                self._epoch = now
+                self._scores = {pid: s for pid, s in scores.items() if s > 1e-9}
+                self._ranking = sorted((-s, pid) for pid, s in self._scores.items())
+                self._built_at = time.monotonic()
+
+    def _ensure_worker(self):
+        # Поток запускается при первом обращении – и заново в каждом воркере после fork
+        if self._pid != os.getpid() and self.app is not None:
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='trending-refresh', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                with self.app.app_context():
+                    self.rebuild()
+            except Exception:
+                self.app.logger.exception('Trending rebuild failed')
+
+    def top(self, limit=10, offset=0):
+        """
+        Возвращает список (post_id, score) с затуханием, приведённым к текущему моменту
+        """
+        self._ensure_worker()
+        if self._built_at is None:
+            # Первое построение после старта процесса; дальше – только фоновый поток
+            self.rebuild(force=False)
+        with self._lock:
+            decay = 2.0 ** (-(datetime.utcnow() - self._epoch).total_seconds() / self.half_life)
+            return [(pid, -neg * decay) for neg, pid in self._ranking[offset:offset + limit]]
+
+    def __len__(self):
+        return len(self._scores)
+
+
+trending = TrendingIndex()
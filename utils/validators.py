@@ -38,6 +38,11 @@ def validate_comment_data(data):
     if 'text' not in data or not data.get('text'):
         errors['text'] = 'Text is required'
 
+    # Ответ на комментарий (опционально)
+    parent_id = data.get('parent_id')
+    if parent_id is not None and (not isinstance(parent_id, int) or isinstance(parent_id, bool)):
+        errors['parent_id'] = 'parent_id must be an integer'
+
     return len(errors) == 0, errors
 
 
@@ -0,0 +1,110 @@
+"""
+Счётчики просмотров постов с отложенной записью (write-behind).
+
+get_post только увеличивает счётчик в памяти процесса. Накопленные приращения
+записываются в Post.views одной транзакцией фоновым потоком раз в
+VIEWS_FLUSH_SECONDS или после VIEWS_FLUSH_EVENTS просмотров, а также при
+завершении процесса.
+"""
+import atexit
+import os
+import threading
+
+
+class ViewCounter:
+    def __init__(self, flush_seconds=10, flush_events=1000):
+        self.flush_seconds = flush_seconds
+        self.flush_events = flush_events
+        self.app = None
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}   # post_id -> ещё не записанное приращение
+        self._inflight = {}  # приращения, которые сейчас записываются в БД
+        self._events = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.flush_seconds = app.config.get('VIEWS_FLUSH_SECONDS', 10)
+        self.flush_events = app.config.get('VIEWS_FLUSH_EVENTS', 1000)
+        self.app = app
+        # Приращения относятся к БД приложения, новому приложению чужие не нужны
+        with self._lock:
+            self._pending, self._inflight, self._events = {}, {}, 0
+        app.extensions['view_counter'] = self
+        atexit.register(self.flush)
+
+    def _ensure_worker(self):
+        # Поток запускается при первом просмотре – и заново в каждом воркере после fork
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('View counter flush failed')
+
+    def hit(self, post_id):
+        """Учесть просмотр поста"""
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + 1
+            self._events += 1
+            full = self._events >= self.flush_events
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, post_id):
+        """Просмотры, ещё не записанные в БД"""
+        return self._pending.get(post_id, 0) + self._inflight.get(post_id, 0)
+
+    def flush(self):
+        """Записать накопленные приращения одной транзакцией"""
+        if self.app is None:
+            return
+        from models import db, Post
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._inflight = pending
+                self._events = 0
+            if not pending:
+                return
+
+            table = Post.__table__
+            statement = table.update() \
+                .where(table.c.id == db.bindparam('post_id')) \
+                .values(views=table.c.views + db.bindparam('delta'),
+                        # Просмотр – не правка: onupdate не должен трогать updated_at
+                        updated_at=table.c.updated_at)
+            rows = [{'post_id': post_id, 'delta': delta} for post_id, delta in pending.items()]
+
+            with self.app.app_context():
+                try:
+                    db.session.execute(statement, rows)
+                    # До commit приращения не видны в Post.views, после – уже видны:
+                    # убираем их из памяти заранее, чтобы pending() не учёл их дважды
+                    # (короткий недосчёт до commit допустим, двойной счёт – нет)
+                    with self._lock:
+                        self._inflight = {}
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    # Возвращаем приращения, чтобы не потерять их до следующей попытки
+                    with self._lock:
+                        self._inflight = {}
+                        for post_id, delta in pending.items():
+                            self._pending[post_id] = self._pending.get(post_id, 0) + delta
+                    raise
+
+
+view_counter = ViewCounter()